@@ -0,0 +1,81 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from telebot.async_telebot import AsyncTeleBot
+from config import BOT_TOKEN, METRICS_HOST, METRICS_PORT, UPDATE_BACKLOG_POLICY
+from updates import BACKLOG_FAST_FORWARD
+from logs import log_event, log_error
+from metrics import start_metrics_server
+import handlers
+from handlers import router, update_tracker, timers, outbound, edit_scheduler
+from handlers import start_up, shut_down, import_document, is_import_document
+
+# Асинхронный режим: запуск через python async_main.py.
+# Опрос Telegram и все вызовы API — корутины AsyncTeleBot в цикле событий,
+# а логика игр — те же обработчики handlers.py, что и в main.py. Они
+# выполняются в пуле потоков под блокировкой чата, поэтому SQLite и
+# разбор команд не держат цикл, а разные чаты не ждут друг друга.
+
+# Инициализация асинхронного бота
+bot = AsyncTeleBot(BOT_TOKEN)
+handlers.bind_bot(bot)
+
+# Потоки обработчиков; очередь исходящих выполняет корутины бота в цикле из run()
+handler_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="handler")
+
+# Обработчик handlers.py в пуле потоков
+async def run_handler(func, *args):
+    return await asyncio.get_running_loop().run_in_executor(handler_executor, func, *args)
+
+# Повторы и устаревшие сообщения отсеиваются до обработчиков, как в main.py;
+# опрос продолжается с последнего принятого update_id (bot.offset в run())
+process_updates = bot.process_new_updates
+
+async def process_new_updates(updates):
+    accepted = update_tracker.filter(updates)
+    if update_tracker.flush_due():
+        await run_handler(update_tracker.flush)
+    if accepted:
+        await process_updates(accepted)
+
+bot.process_new_updates = process_new_updates
+
+# Единые обработчики: фильтры маршрутизатора выполняются в цикле, сами обработчики — в пуле
+@bot.message_handler(func=router.match_message)
+async def dispatch_message(message):
+    await run_handler(router.dispatch, message)
+
+@bot.callback_query_handler(func=router.match_callback)
+async def dispatch_callback(call):
+    await run_handler(router.dispatch, call)
+
+@bot.message_handler(content_types=["document"], func=is_import_document)
+async def dispatch_document(message):
+    await run_handler(import_document, message)
+
+# Запуск бота в асинхронном режиме
+async def run():
+    loop = asyncio.get_running_loop()
+    outbound.loop = loop
+    await run_handler(start_up, edit_scheduler)
+    if update_tracker.last_update_id:
+        bot.offset = update_tracker.last_update_id + 1
+    log_event("timers_restored", count=await run_handler(timers.restore))
+    if METRICS_PORT:
+        start_metrics_server(METRICS_HOST, METRICS_PORT)
+        log_event("metrics_listening", host=METRICS_HOST, port=METRICS_PORT)
+    try:
+        await bot.infinity_polling(skip_pending=UPDATE_BACKLOG_POLICY == BACKLOG_FAST_FORWARD)
+    finally:
+        # Сначала доработавшие обработчики, затем таймеры, очереди и база; цикл ещё
+        # работает и выполняет последние вызовы API из очереди
+        await loop.run_in_executor(None, handler_executor.shutdown)
+        await loop.run_in_executor(None, shut_down)
+        await bot.close_session()
+
+
+if __name__ == "__main__":
+    log_event("bot_started", mode="async")
+    try:
+        asyncio.run(run())
+    except Exception as e:
+        log_error("polling_failed", e)
@@ -0,0 +1,72 @@
+"""Бенчмарк движка Бинго: время обработки одного ряда при 50k карточек.
+
+Заодно проверяет, что объявление тысяч заполненных карточек делится на
+сообщения в пределах лимита Telegram, а не вошедшие в них карточки
+посчитаны в строке «…и ещё N».
+
+Запуск: python benchmarks/bench_bingo.py
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bingo import BingoEngine  # noqa: E402
+from game_state import GameState  # noqa: E402
+from handlers import render_bingo_winners  # noqa: E402
+
+CARDS = 50_000
+ROWS = 20
+TELEGRAM_LIMIT = 4096
+
+
+def main():
+    rng = random.Random(7)
+    engine = BingoEngine()
+    started = time.perf_counter()
+    for user_id in range(CARDS):
+        engine.add_card(user_id, rng.sample(range(1, 101), 5))
+    print(f"Регистрация {CARDS} карточек: {(time.perf_counter() - started) * 1000:.1f} мс")
+
+    deck = list(range(1, 101))
+    rng.shuffle(deck)
+    timings = []
+    for idx in range(ROWS):
+        row = deck[idx * 5:idx * 5 + 5]
+        started = time.perf_counter()
+        completed = engine.draw(row)
+        timings.append((time.perf_counter() - started) * 1000)
+        print(f"Ряд {idx + 1:>2}: {timings[-1]:6.2f} мс, новых победителей: {len(completed)}")
+    print(f"Среднее время ряда: {sum(timings) / len(timings):.2f} мс, максимум: {max(timings):.2f} мс")
+
+    probes = [rng.randrange(CARDS) for _ in range(100_000)]
+    started = time.perf_counter()
+    for user_id in probes:
+        engine.has_bingo(user_id)
+    print(f"Проверка заявки «бинго»: {(time.perf_counter() - started) / len(probes) * 1e6:.2f} мкс")
+    check_winners_announcement(rng, deck)
+
+
+# Объявление победителей игры на CARDS записей: сообщения не длиннее лимита, каждая карточка учтена
+def check_winners_announcement(rng, deck):
+    game = GameState()
+    for user_id in range(CARDS):
+        game.add_player(user_id, f"@user{user_id}", rng.sample(range(1, 101), 5))
+    for idx in range(ROWS):
+        winners = game.add_bingo_row(deck[idx * 5:idx * 5 + 5])
+        if not winners:
+            continue
+        messages = render_bingo_winners(winners)
+        longest = max(map(len, messages))
+        assert longest <= TELEGRAM_LIMIT, f"ряд {idx + 1}: сообщение из {longest} символов"
+        listed = sum(text.count(". @user") for text in messages)
+        rest = messages[-1].rpartition("…и ещё ")[2].split()[0] if "…и ещё " in messages[-1] else 0
+        assert listed + int(rest) == len(winners), f"ряд {idx + 1}: в объявлении {listed} + {rest} из {len(winners)}"
+        print(f"Объявление ряда {idx + 1:>2}: {len(winners)} карточек в {len(messages)} сообщ., "
+              f"самое длинное {longest} символов")
+
+
+if __name__ == "__main__":
+    main()
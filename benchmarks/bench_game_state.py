@@ -0,0 +1,88 @@
+"""Микробенчмарк: линейные проходы по спискам против индексов GameState.
+
+Запуск: python benchmarks/bench_game_state.py
+"""
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from game_state import GameState, Privileges  # noqa: E402
+
+PLAYERS = 10_000
+VIPS = 1_000
+LOOKUPS = 1_000
+
+
+# Старая модель: словарь со списками и линейным поиском
+def legacy_state(players, vips):
+    state = {"players": [], "vip_users": [], "bingo_numbers": [[n, n + 1, n + 2, n + 3, n + 4] for n in range(1, 96, 5)]}
+    for user_id, numbers in players:
+        state["players"].append({"user_id": user_id, "username": f"@user{user_id}", "numbers": numbers})
+    for user_id in vips:
+        state["vip_users"].append({"user_id": user_id, "username": f"@user{user_id}"})
+    return state
+
+
+def legacy_count_entries(state, user_id):
+    count = 0
+    for entry in state["players"]:
+        if entry["user_id"] == user_id:
+            count += 1
+    return count
+
+
+def legacy_is_vip(state, user_id):
+    for vip in state["vip_users"]:
+        if vip["user_id"] == user_id:
+            return True
+    return False
+
+
+def legacy_check_bingo(state, user_id):
+    user_entries = [entry for entry in state["players"] if entry["user_id"] == user_id]
+    bingo_numbers = set()
+    for row in state["bingo_numbers"]:
+        bingo_numbers.update(row)
+    return any(set(entry["numbers"]).issubset(bingo_numbers) for entry in user_entries)
+
+
+def indexed_state(players, vips):
+    state = GameState()
+    state.start("bingo")
+    for user_id, numbers in players:
+        state.add_player(user_id, f"@user{user_id}", numbers)
+    for n in range(1, 96, 5):
+        state.add_bingo_row([n, n + 1, n + 2, n + 3, n + 4])
+    privileges = Privileges()
+    for user_id in vips:
+        privileges.add_vip(user_id, f"@user{user_id}")
+    return state, privileges
+
+
+def main():
+    rng = random.Random(42)
+    players = [(user_id, rng.sample(range(1, 101), 5)) for user_id in range(PLAYERS)]
+    vips = list(range(0, PLAYERS, PLAYERS // VIPS))
+    probes = [rng.randrange(PLAYERS * 2) for _ in range(LOOKUPS)]
+
+    legacy = legacy_state(players, vips)
+    indexed, privileges = indexed_state(players, vips)
+
+    cases = [
+        ("count_entries", lambda u: legacy_count_entries(legacy, u), indexed.count_entries),
+        ("is_vip", lambda u: legacy_is_vip(legacy, u), privileges.is_vip),
+        ("check_bingo", lambda u: legacy_check_bingo(legacy, u), indexed.has_bingo),
+    ]
+    print(f"{PLAYERS} игроков, {VIPS} VIP, {LOOKUPS} запросов на операцию")
+    print(f"{'операция':<15}{'список, мкс':>14}{'индекс, мкс':>14}{'ускорение':>12}")
+    for name, legacy_fn, indexed_fn in cases:
+        legacy_time = timeit.timeit(lambda: [legacy_fn(u) for u in probes], number=1) / LOOKUPS * 1e6
+        indexed_time = timeit.timeit(lambda: [indexed_fn(u) for u in probes], number=1) / LOOKUPS * 1e6
+        print(f"{name:<15}{legacy_time:>14.2f}{indexed_time:>14.2f}{legacy_time / indexed_time:>11.0f}x")
+
+
+if __name__ == "__main__":
+    main()
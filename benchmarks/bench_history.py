@@ -0,0 +1,72 @@
+"""Бенчмарк архива игр и запросов статистики.
+
+Архивирует GAMES игр Бинго по PLAYERS записей из общего пула игроков,
+затем измеряет время запросов /userstats и /numstats по заполненному архиву.
+
+Запуск: python benchmarks/bench_history.py [число игр]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import Storage  # noqa: E402
+from game_state import GameState  # noqa: E402
+from history import GameHistory  # noqa: E402
+
+GAMES = 100_000
+PLAYERS = 10
+USERS = 5_000
+ROWS = 12
+QUERIES = 1_000
+
+
+def play_game(state, rng):
+    state.start("bingo", seed=rng.getrandbits(32))
+    for user_id in rng.sample(range(1, USERS + 1), PLAYERS):
+        state.add_player(user_id, f"@user{user_id}", rng.sample(range(1, 101), 5))
+    state.registration_open = False
+    for _ in range(ROWS):
+        row = state.draw_row()
+        if row:
+            state.add_bingo_row(row)
+
+
+def main():
+    games = int(sys.argv[1]) if len(sys.argv) > 1 else GAMES
+    rng = random.Random(1)
+    with tempfile.TemporaryDirectory() as directory:
+        storage = Storage(os.path.join(directory, "history.db"))
+        history = GameHistory(storage)
+        state = GameState(-100)
+        archive_time = 0.0
+        for _ in range(games):
+            play_game(state, rng)
+            started = time.perf_counter()
+            history.archive(state)
+            archive_time += time.perf_counter() - started
+        print(f"архив {games} игр по {PLAYERS} записей: {archive_time / games * 1e6:.0f} мкс/игра")
+
+        started = time.perf_counter()
+        for _ in range(QUERIES):
+            history.user_stats(rng.randint(1, USERS))
+        by_id = (time.perf_counter() - started) / QUERIES * 1e3
+        started = time.perf_counter()
+        for _ in range(QUERIES):
+            history.user_stats(f"@USER{rng.randint(1, USERS)}")
+        by_name = (time.perf_counter() - started) / QUERIES * 1e3
+        started = time.perf_counter()
+        for _ in range(QUERIES // 10):
+            history.top_numbers()
+            history.games_count()
+        numbers = (time.perf_counter() - started) / (QUERIES // 10) * 1e3
+        print(f"/userstats по user_id: {by_id:.3f} мс, по @username: {by_name:.3f} мс, "
+              f"/numstats: {numbers:.3f} мс")
+        storage.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Бенчмарк восстановления игры из журнала.
+
+Записывает игру Бинго на 10k записей и 20 рядов, затем измеряет время
+restore() при холодном старте — с последним снимком и без него.
+
+Запуск: python benchmarks/bench_journal.py
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import Storage  # noqa: E402
+from game_state import GameState, SessionRegistry  # noqa: E402
+from journal import GameJournal  # noqa: E402
+
+ENTRIES = 10_000
+ROWS = 20
+
+
+def record_game(path, snapshot_every):
+    rng = random.Random(1)
+    storage = Storage(path)
+    journal = GameJournal(storage, snapshot_every=snapshot_every)
+    state = GameState(-100)
+    state.start("bingo")
+    journal.record(state, "start", game="bingo")
+    state.pinned_message_id = 42
+    journal.record(state, "pinned", message_id=42)
+    started = time.perf_counter()
+    for user_id in range(ENTRIES):
+        numbers = rng.sample(range(1, 101), 5)
+        state.add_player(user_id, f"@user{user_id}", numbers)
+        journal.record(state, "register", user_id=user_id, username=f"@user{user_id}", numbers=numbers)
+    write_time = (time.perf_counter() - started) / ENTRIES * 1e6
+    state.registration_open = False
+    journal.record(state, "close")
+    for _ in range(ROWS):
+        row = rng.sample(range(1, 101), 5)
+        state.add_bingo_row(row)
+        journal.record(state, "draw", row=row)
+    storage.close()
+    return write_time
+
+
+def restore_game(path):
+    started = time.perf_counter()
+    storage = Storage(path)
+    sessions = SessionRegistry()
+    replayed = GameJournal(storage).restore(sessions)
+    state = sessions.get(-100)
+    elapsed = (time.perf_counter() - started) * 1000
+    storage.close()
+    assert len(state.players) == ENTRIES and state.pinned_message_id == 42
+    return elapsed, replayed
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        for snapshot_every in (ENTRIES * 10, 1000):
+            path = os.path.join(directory, f"journal_{snapshot_every}.db")
+            write_time = record_game(path, snapshot_every)
+            elapsed, replayed = restore_game(path)
+            print(f"снимок каждые {snapshot_every:>6} записей: запись {write_time:.1f} мкс/запись, "
+                  f"восстановление {elapsed:.1f} мс ({replayed} записей журнала)")
+
+
+if __name__ == "__main__":
+    main()
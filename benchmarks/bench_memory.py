@@ -0,0 +1,82 @@
+"""Бенчмарк памяти на одну запись игрока: словари против Entry.
+
+Регистрирует ENTRIES записей Бинго от USERS игроков (у каждого несколько
+записей, имя приходит новой строкой, как из сообщения Telegram) и через
+tracemalloc считает байты на запись для старой модели — словаря со списком
+чисел, — отдельно для записей Entry и для GameState целиком: с индексами,
+движком Бинго и списком игроков. Итог честнее сравнивать по GameState:
+экономия на Entry не должна съедаться индексами и кэшами вокруг неё.
+
+Запуск: python benchmarks/bench_memory.py [число записей]
+"""
+import os
+import random
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from game_state import Entry, GameState  # noqa: E402
+
+ENTRIES = 50_000
+USERS = 10_000
+
+
+def registrations(count):
+    rng = random.Random(1)
+    for _ in range(count):
+        user_id = rng.randint(1, USERS)
+        # Новая строка на каждую запись, как display_name() для каждого сообщения
+        yield user_id, "".join(["@user", str(user_id)]), rng.sample(range(1, 101), 5)
+
+
+# Старая модель: запись — словарь со списком чисел и своей строкой имени
+def legacy_players(items):
+    players = []
+    for user_id, username, numbers in items:
+        players.append({"user_id": user_id, "username": username, "numbers": numbers, "card_id": len(players)})
+    return players
+
+
+def compact_players(items):
+    return [Entry(user_id, username, numbers, card_id) for card_id, (user_id, username, numbers) in enumerate(items)]
+
+
+def full_state(items):
+    state = GameState(-100)
+    state.start("bingo", seed=1)
+    for user_id, username, numbers in items:
+        state.add_player(user_id, username, numbers)
+    return state
+
+
+def copies(items):
+    """Свежие копии имён и чисел: строки и списки каждой модели учитываются в её замере."""
+    return [(user_id, "".join([username[:1], username[1:]]), list(numbers)) for user_id, username, numbers in items]
+
+
+def measure(build, items):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build(copies(items))
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del result
+    return used / len(items)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else ENTRIES
+    items = list(registrations(count))
+    legacy = measure(legacy_players, items)
+    compact = measure(compact_players, items)
+    state = measure(full_state, items)
+    print(f"{count} записей от {USERS} игроков")
+    print(f"словарь + list + своя строка имени: {legacy:.0f} байт/запись")
+    print(f"Entry (__slots__, bytes, sys.intern): {compact:.0f} байт/запись ({legacy / compact:.1f}x меньше)")
+    print(f"GameState целиком (индексы, движок Бинго, список игроков): {state:.0f} байт/запись "
+          f"({legacy / state:.1f}x меньше старой модели)")
+
+
+if __name__ == "__main__":
+    main()
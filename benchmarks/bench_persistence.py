@@ -0,0 +1,88 @@
+"""Бенчмарк сохранения: полная перезапись таблиц против записи изменений.
+
+Для каждого размера таблиц (VIP + бонусы) измеряется время сохранения
+одного изменения, как после команды /vip.
+
+Запуск: python benchmarks/bench_persistence.py
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import Storage  # noqa: E402
+from game_state import Privileges  # noqa: E402
+
+SIZES = [1_000, 10_000, 100_000]
+CHAT_ID = -100
+REPEATS = 5
+
+
+# Прежний save_data: новое подключение, DELETE и построчный INSERT
+def legacy_save_data(path, game_state):
+    conn = sqlite3.connect(path)
+    cur = conn.cursor()
+    try:
+        cur.execute("DELETE FROM vip_users")
+        for vip_id, vip_username in game_state.vip_users.items():
+            cur.execute("INSERT OR REPLACE INTO vip_users (user_id, username) VALUES (?, ?)",
+                        (vip_id, vip_username))
+        cur.execute("DELETE FROM chat_bonus_users")
+        for chat_id, bonuses in game_state.bonus_users.items():
+            for user_id, count in bonuses.items():
+                cur.execute("INSERT OR REPLACE INTO chat_bonus_users (chat_id, user_id, bonus_count) VALUES (?, ?, ?)",
+                            (chat_id, user_id, count))
+        conn.commit()
+    finally:
+        cur.close()
+        conn.close()
+
+
+def filled_state(size):
+    state = Privileges()
+    for user_id in range(size):
+        state.add_vip(user_id, f"@user{user_id}")
+        state.add_bonus(CHAT_ID, size + user_id, 1)
+    return state
+
+
+def measure(size, directory):
+    state = filled_state(size)
+
+    legacy_path = os.path.join(directory, f"legacy_{size}.db")
+    legacy_storage = Storage(legacy_path)
+    legacy_storage.open()  # Создаёт таблицы
+    legacy_storage.close()
+    legacy_save_data(legacy_path, state)
+    started = time.perf_counter()
+    for idx in range(REPEATS):
+        state.add_vip(size * 2 + idx, f"@new{idx}")
+        legacy_save_data(legacy_path, state)
+    legacy_time = (time.perf_counter() - started) / REPEATS * 1000
+
+    delta_path = os.path.join(directory, f"delta_{size}.db")
+    storage = Storage(delta_path)
+    for user_id, username in state.vip_users.items():
+        storage.save_vip(user_id, username)
+    storage.flush()
+    started = time.perf_counter()
+    for idx in range(REPEATS):
+        storage.save_vip(size * 3 + idx, f"@new{idx}")
+    delta_time = (time.perf_counter() - started) / REPEATS * 1000
+    storage.close()
+    return legacy_time, delta_time
+
+
+def main():
+    print(f"{'строк':>8}{'перезапись, мс':>17}{'дельта, мс':>13}{'ускорение':>12}")
+    with tempfile.TemporaryDirectory() as directory:
+        for size in SIZES:
+            legacy_time, delta_time = measure(size, directory)
+            print(f"{size:>8}{legacy_time:>17.2f}{delta_time:>13.3f}{legacy_time / delta_time:>11.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""Локальная замена Telegram Bot API для нагрузочных тестов.
+
+Сервер принимает вызовы вида /bot<token>/<method>, считает их по методам
+и отвечает так же, как Telegram: sendMessage и editMessageText возвращают
+сообщение, остальные методы — True. Умеет добавлять задержку ответа и
+отвечать 429 с retry_after на заданную долю вызовов. Текст длиннее 4096
+символов отклоняется с 400, как в настоящем API.
+
+Используется из loadtest.py, но можно запустить и отдельно:
+    python benchmarks/fake_api.py --port 8081 --latency 0.05 --error-rate 0.01
+"""
+import argparse
+import itertools
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+MAX_TEXT_LENGTH = 4096
+MESSAGE_METHODS = ("sendMessage", "editMessageText")
+
+
+class FakeBotApi:
+    """Фейковый Bot API: запись вызовов, задержка и ответы 429."""
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, error_rate=0.0, retry_after=1, seed=None):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.rng = random.Random(seed)
+        self.message_ids = itertools.count(1)
+        self.calls = {}  # {method: число вызовов}
+        self.rate_limited = 0
+        self.rejected = 0
+        self.max_text_length = 0
+        self.lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def api_url(self):
+        """Шаблон для telebot.apihelper.API_URL."""
+        return self.url + "/bot{0}/{1}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="fake-bot-api", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def stats(self):
+        with self.lock:
+            return {
+                "calls": dict(self.calls),
+                "total": sum(self.calls.values()),
+                "rate_limited": self.rate_limited,
+                "rejected": self.rejected,
+                "max_text_length": self.max_text_length,
+            }
+
+    def handle(self, method, params):
+        """Возвращает (HTTP-статус, JSON-ответ) на вызов метода."""
+        if self.latency:
+            time.sleep(self.latency)
+        text = params.get("text", "")
+        with self.lock:
+            self.calls[method] = self.calls.get(method, 0) + 1
+            self.max_text_length = max(self.max_text_length, len(text))
+            if self.error_rate and self.rng.random() < self.error_rate:
+                self.rate_limited += 1
+                return 429, {"ok": False, "error_code": 429,
+                             "description": f"Too Many Requests: retry after {self.retry_after}",
+                             "parameters": {"retry_after": self.retry_after}}
+            if len(text) > MAX_TEXT_LENGTH:
+                self.rejected += 1
+                return 400, {"ok": False, "error_code": 400, "description": "Bad Request: message is too long"}
+        if method == "getMe":
+            return 200, {"ok": True, "result": {"id": 1, "is_bot": True, "first_name": "Fake", "username": "fake_bot"}}
+        if method in MESSAGE_METHODS:
+            chat_id = int(params.get("chat_id", 0))
+            message_id = int(params["message_id"]) if "message_id" in params else next(self.message_ids)
+            return 200, {"ok": True, "result": {"message_id": message_id, "date": int(time.time()),
+                                                "chat": {"id": chat_id, "type": "supergroup"},
+                                                "text": text}}
+        return 200, {"ok": True, "result": True}
+
+    def _make_handler(self):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, как у api.telegram.org
+
+            def do_GET(self):
+                self._dispatch(b"")
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                self._dispatch(self.rfile.read(length))
+
+            def _dispatch(self, body):
+                parts = urlsplit(self.path)
+                method = parts.path.rsplit("/", 1)[-1]
+                params = dict(parse_qsl(parts.query))
+                if body:
+                    if self.headers.get("Content-Type", "").startswith("application/json"):
+                        params.update(json.loads(body))
+                    else:
+                        params.update(parse_qsl(body.decode()))
+                status, result = api.handle(method, params)
+                data = json.dumps(result).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=0.0, help="задержка ответа, с")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="доля ответов 429")
+    parser.add_argument("--retry-after", type=int, default=1)
+    args = parser.parse_args()
+
+    api = FakeBotApi(args.host, args.port, args.latency, args.error_rate, args.retry_after)
+    print(f"Фейковый Bot API: {api.api_url}")
+    try:
+        api.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    print(f"Вызовы: {api.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+"""Нагрузочный тест обработчиков handlers.py на фейковом Bot API.
+
+Бот из main.py работает как есть, но его вызовы Telegram уходят в локальный
+FakeBotApi (fake_api.py), а обновления подаются напрямую в
+bot.process_new_updates() с заданным темпом. База создаётся во временной
+папке, поэтому рабочая database.db не затрагивается.
+
+Сценарии:
+    register_storm — 5k пользователей жмут «Записаться» на рулетку за 30 с;
+    bingo_draws    — 2k записей на Бинго за 30 с, затем 40 выдач /num;
+    bingo_claims   — 2k записей, 20 рядов и поток из 5k сообщений «бинго» за 10 с.
+
+Отчёт: p50/p99 времени обработчика, p99 задержки от прихода обновления до
+конца обработки, p50/p99 времени от нажатия кнопки до ответа на него,
+обновлений в секунду и вызовов API на обновление.
+
+Запуск:
+    python benchmarks/loadtest.py register_storm
+    python benchmarks/loadtest.py bingo_draws --speed 0 --latency 0.05 --error-rate 0.02
+--speed 0 подаёт обновления без пауз. Исходящая очередь работает с лимитами
+из config.py, как в боевом боте, поэтому время ответа на кнопку и время
+допосылки очереди показывают и упирание в лимиты Telegram; --no-limits
+снимает их, чтобы мерить только сам бот.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from config import ADMIN_ID, CHAT_IDS  # noqa: E402
+from fake_api import FakeBotApi  # noqa: E402
+
+ADMIN = ADMIN_ID[0]
+CHAT = CHAT_IDS[0]
+USER_BASE = 10_000_000  # user_id игроков, чтобы не совпасть с админами
+
+
+class UpdateFactory:
+    """JSON обновлений Telegram от имени пользователей чата."""
+
+    def __init__(self):
+        self.update_id = 0
+        self.message_id = 0
+
+    def _next(self):
+        self.update_id += 1
+        self.message_id += 1
+        return self.update_id, self.message_id
+
+    def user(self, user_id):
+        return {"id": user_id, "is_bot": False, "first_name": f"User{user_id}", "username": f"user{user_id}"}
+
+    def chat(self):
+        return {"id": CHAT, "type": "supergroup", "title": "Load test"}
+
+    def message(self, user_id, text):
+        update_id, message_id = self._next()
+        message = {"message_id": message_id, "date": int(time.time()), "chat": self.chat(),
+                   "from": self.user(user_id), "text": text}
+        if text.startswith("/"):
+            message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+        return {"update_id": update_id, "message": message}
+
+    def callback(self, user_id, data):
+        update_id, message_id = self._next()
+        bot_message = {"message_id": 1, "date": int(time.time()), "chat": self.chat(),
+                       "from": {"id": 1, "is_bot": True, "first_name": "Fake"}, "text": "📋 Список игроков:"}
+        return {"update_id": update_id,
+                "callback_query": {"id": str(update_id), "from": self.user(user_id), "chat_instance": "1",
+                                   "data": data, "message": bot_message}}
+
+
+# Сценарии возвращают список (секунда прихода, JSON обновления)
+def register_storm(factory, users, rng):
+    updates = [(0.0, factory.message(ADMIN, "/game")), (0.5, factory.callback(ADMIN, "roulette"))]
+    users = users or 5000
+    for idx in range(users):
+        updates.append((1.0 + 30.0 * idx / users, factory.callback(USER_BASE + idx, "register")))
+    return updates
+
+
+def bingo_registrations(factory, users, duration, rng):
+    updates = [(0.0, factory.message(ADMIN, "/game")), (0.5, factory.callback(ADMIN, "bingo"))]
+    for idx in range(users):
+        numbers = " ".join(map(str, rng.sample(range(1, 101), 5)))
+        updates.append((1.0 + duration * idx / users, factory.message(USER_BASE + idx, f"@ {numbers}")))
+    updates.append((2.0 + duration, factory.message(ADMIN, "/spisok")))
+    return updates
+
+
+def bingo_draws(factory, users, rng):
+    updates = bingo_registrations(factory, users or 2000, 30.0, rng)
+    start = updates[-1][0] + 1.0
+    for idx in range(40):
+        updates.append((start + idx, factory.message(ADMIN, "/num")))
+    return updates
+
+
+def bingo_claims(factory, users, rng):
+    players = 2000
+    updates = bingo_registrations(factory, players, 10.0, rng)
+    start = updates[-1][0] + 1.0
+    for idx in range(20):
+        updates.append((start + idx * 0.1, factory.message(ADMIN, "/num")))
+    start += 3.0
+    claims = users or 5000
+    for idx in range(claims):
+        # Каждый десятый — не участник игры
+        user_id = USER_BASE + (rng.randrange(players) if idx % 10 else players + idx)
+        updates.append((start + 10.0 * idx / claims, factory.message(user_id, rng.choice(["бинго", "Бинго", "bingo"]))))
+    return updates
+
+
+SCENARIOS = {
+    "register_storm": register_storm,
+    "bingo_draws": bingo_draws,
+    "bingo_claims": bingo_claims,
+}
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def feed(bot, updates, speed):
+    """Подаёт обновления в бота; возвращает (времена обработчиков, задержки, длительность)."""
+    from telebot.types import Update
+
+    handler_times = []
+    delays = []
+    started = time.perf_counter()
+    for at, data in updates:
+        arrival = started + at / speed if speed else time.perf_counter()
+        wait = arrival - time.perf_counter()
+        if wait > 0:
+            time.sleep(wait)
+        handler_started = time.perf_counter()
+        bot.process_new_updates([Update.de_json(data)])
+        finished = time.perf_counter()
+        handler_times.append(finished - handler_started)
+        delays.append(finished - arrival)
+    return handler_times, delays, time.perf_counter() - started
+
+
+def drain(handlers, timeout):
+    """Доделывает фоновую работу, отправляет отложенные правки и ждёт опустошения исходящей очереди."""
+    deadline = time.monotonic() + timeout
+    handlers.edit_scheduler.stop(timeout)
+    while any(handlers.outbound.stats()[key] for key in ("queued", "in_flight")) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    handlers.outbound.stop(timeout=max(0, deadline - time.monotonic()))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("scenario", choices=sorted(SCENARIOS))
+    parser.add_argument("--users", type=int, default=0, help="размер основного потока обновлений сценария")
+    parser.add_argument("--speed", type=float, default=1.0, help="ускорение времени сценария, 0 — без пауз")
+    parser.add_argument("--latency", type=float, default=0.0, help="задержка ответа фейкового API, с")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="доля ответов 429")
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--no-limits", action="store_true", help="снять лимиты исходящей очереди из config.py")
+    parser.add_argument("--drain-timeout", type=float, default=300.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--log-level", default="WARNING", help="уровень логов бота во время теста")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    random.seed(args.seed)  # Ряды /num
+    api = FakeBotApi(latency=args.latency, error_rate=args.error_rate, retry_after=args.retry_after,
+                     seed=args.seed).start()
+
+    workdir = tempfile.mkdtemp(prefix="loadtest-")
+    os.chdir(workdir)  # database.db бота создаётся здесь
+    from telebot import apihelper
+    apihelper.API_URL = api.api_url
+    import main as bot_main
+    import handlers
+    from outbound import TokenBucket
+    from logs import set_level
+    from metrics import metrics
+
+    set_level(args.log_level)
+    handlers.start_up(handlers.edit_scheduler)
+
+    bot_main.bot.threaded = False  # Обработчики выполняются в потоке подачи, как в воркере webhook
+    if args.no_limits:
+        handlers.outbound.global_bucket = TokenBucket(1e9, 1e9)
+        handlers.outbound.callback_bucket = TokenBucket(1e9, 1e9)
+        handlers.outbound.chat_rate = handlers.outbound.chat_burst = 1e9
+
+    updates = SCENARIOS[args.scenario](UpdateFactory(), args.users, rng)
+    handler_times, delays, elapsed = feed(bot_main.bot, updates, args.speed)
+    drain_started = time.perf_counter()
+    drain(handlers, args.drain_timeout)
+    drain_time = time.perf_counter() - drain_started
+
+    api_stats = api.stats()
+    api.stop()
+    count = len(updates)
+    limits = "без лимитов" if args.no_limits else "лимиты из config.py"
+    print(f"Сценарий {args.scenario} ({limits}): {count} обновлений за {elapsed:.2f} с ({count / elapsed:.0f}/с), "
+          f"очередь исходящих допослана за {drain_time:.2f} с")
+    print(f"Обработчик p50: {percentile(handler_times, 0.5) * 1000:.3f} мс, "
+          f"p99: {percentile(handler_times, 0.99) * 1000:.3f} мс, "
+          f"max: {max(handler_times) * 1000:.3f} мс")
+    print(f"От прихода до конца обработки p50: {percentile(delays, 0.5) * 1000:.3f} мс, "
+          f"p99: {percentile(delays, 0.99) * 1000:.3f} мс")
+    print(f"Вызовов API: {api_stats['total']} ({api_stats['total'] / count:.2f} на обновление), "
+          f"по методам: {api_stats['calls']}")
+    print(f"Ответов 429: {api_stats['rate_limited']}, отклонено (длинный текст): {api_stats['rejected']}, "
+          f"самый длинный текст: {api_stats['max_text_length']}")
+    for _, (answered, quantiles) in metrics.summary("callback_answer_seconds").items():
+        print(f"Ответ на кнопку от нажатия ({answered} шт.) p50: {quantiles[0] * 1000:.1f} мс, "
+              f"p99: {quantiles[2] * 1000:.1f} мс")
+    print(f"Маршрутизатор: {handlers.router.stats()}")
+    print(f"Правки закрепа: {handlers.edit_scheduler.stats()}")
+    outbound_stats = handlers.outbound.stats()
+    print(f"Исходящая очередь: {outbound_stats}")
+    if outbound_stats["queued"]:
+        print(f"Не допослано за {args.drain_timeout:.0f} с: {outbound_stats['queued']} вызовов — очередь упирается в лимиты")
+
+
+if __name__ == "__main__":
+    main()
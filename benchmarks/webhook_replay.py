@@ -0,0 +1,64 @@
+"""Проигрывание записанных обновлений Telegram в локальный webhook.
+
+Файл — JSONL, по одному JSON обновления в строке (как их присылает Telegram).
+Скрипт отправляет их POST-запросами в несколько потоков, печатает время
+ответа сервера и, если указан --metrics, метрики webhook_* с /metrics бота.
+
+Запуск (бот: python main.py --webhook с WEBHOOK_SECRET и METRICS_PORT):
+    python benchmarks/webhook_replay.py updates.jsonl --url http://127.0.0.1:8443 --secret SECRET \
+        --metrics http://127.0.0.1:9100
+"""
+import argparse
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+
+def post_update(url, secret, body):
+    request = urllib.request.Request(url + "/webhook", data=body, method="POST",
+                                     headers={"Content-Type": "application/json",
+                                              "X-Telegram-Bot-Api-Secret-Token": secret})
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request) as response:
+            status = response.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    return status, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("updates")
+    parser.add_argument("--url", default="http://127.0.0.1:8443")
+    parser.add_argument("--secret", required=True)
+    parser.add_argument("--metrics", default="")
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    with open(args.updates, encoding="utf-8") as f:
+        bodies = [line.strip().encode() for line in f if line.strip()]
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(args.concurrency) as pool:
+        results = list(pool.map(lambda body: post_update(args.url, args.secret, body), bodies))
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(latency for _, latency in results)
+    statuses = {}
+    for status, _ in results:
+        statuses[status] = statuses.get(status, 0) + 1
+    print(f"Отправлено {len(bodies)} обновлений за {elapsed:.2f} с ({len(bodies) / elapsed:.0f}/с)")
+    print(f"Ответы: {statuses}")
+    print(f"Время ответа p50: {latencies[len(latencies) // 2] * 1000:.2f} мс, "
+          f"p99: {latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000:.2f} мс")
+    if args.metrics:
+        with urllib.request.urlopen(args.metrics + "/metrics") as response:
+            for line in response.read().decode().splitlines():
+                if line.startswith("game_webhook_"):
+                    print(f"Сервер: {line}")
+
+
+if __name__ == "__main__":
+    main()
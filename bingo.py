@@ -0,0 +1,124 @@
+import random
+from array import array
+
+MAX_NUMBER = 100
+ROW_SIZE = 5  # Чисел в одном ряду /num
+SEED_BITS = 63  # seed колоды помещается в знаковый INTEGER SQLite (архив игр)
+
+
+def numbers_to_mask(numbers):
+    """Переводит числа 1..100 в битовую маску: число n — бит n-1."""
+    mask = 0
+    for number in numbers:
+        mask |= 1 << (number - 1)
+    return mask
+
+
+class DrawDeck:
+    """Колода чисел 1..MAX_NUMBER, перемешанная один раз за игру.
+
+    Порядок задаётся seed, поэтому игру можно переиграть и проверить по
+    журналу. deal() сдаёт следующие числа за O(1) на число и пропускает уже
+    выпавшие (например, восстановленные из журнала), так что числа в рядах
+    не повторяются. Пустой ряд означает, что колода закончилась.
+    """
+
+    def __init__(self, seed=None):
+        self.shuffle(seed)
+
+    def shuffle(self, seed=None):
+        self.seed = seed if seed is not None else random.getrandbits(SEED_BITS)
+        self.numbers = list(range(1, MAX_NUMBER + 1))
+        random.Random(self.seed).shuffle(self.numbers)
+        self.position = 0
+
+    def deal(self, count, is_drawn):
+        """Следующие count невыпавших чисел (меньше, если колода кончается)."""
+        row = []
+        numbers = self.numbers
+        while len(row) < count and self.position < len(numbers):
+            number = numbers[self.position]
+            self.position += 1
+            if not is_drawn(number):
+                row.append(number)
+        return row
+
+
+class BingoEngine:
+    """Инкрементальная проверка карточек Бинго.
+
+    Выпавшие числа хранятся 100-битной маской. Обратный индекс
+    number -> array card_id позволяет при выдаче ряда увеличивать счётчики
+    совпадений только у карточек с этими числами, поэтому заполненные
+    карточки находятся сразу, а заявка «бинго» — просто поиск по множеству.
+    Размеры карточек и счётчики — bytearray, индекс — array('I'): на
+    карточку уходят байты, а не объекты int и указатели списков.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.drawn_mask = 0
+        self.card_count = 0
+        self.card_sizes = bytearray()
+        self.hits = bytearray()
+        self.owners = []  # card_id -> user_id
+        self.cards_by_number = [array("I") for _ in range(MAX_NUMBER + 1)]
+        self.completed_cards = []
+        self.winners = set()  # user_id с хотя бы одной заполненной карточкой
+
+    def add_card(self, user_id, numbers):
+        """Регистрирует карточку и возвращает её card_id."""
+        card_id = self.card_count
+        self.card_count += 1
+        mask = numbers_to_mask(numbers)
+        self.card_sizes.append(len(numbers))
+        self.owners.append(user_id)
+        hits = (mask & self.drawn_mask).bit_count()
+        self.hits.append(hits)
+        for number in numbers:
+            self.cards_by_number[number].append(card_id)
+        if hits == len(numbers):
+            self._complete(card_id)
+        return card_id
+
+    def draw(self, numbers):
+        """Отмечает выпавшие числа; возвращает card_id только что заполненных карточек."""
+        completed = []
+        hits = self.hits
+        sizes = self.card_sizes
+        for number in numbers:
+            bit = 1 << (number - 1)
+            if self.drawn_mask & bit:
+                continue
+            self.drawn_mask |= bit
+            for card_id in self.cards_by_number[number]:
+                hits[card_id] += 1
+                if hits[card_id] == sizes[card_id]:
+                    completed.append(card_id)
+        for card_id in completed:
+            self._complete(card_id)
+        return completed
+
+    def is_drawn(self, number):
+        return bool(self.drawn_mask >> (number - 1) & 1)
+
+    def drawn_count(self):
+        return self.drawn_mask.bit_count()
+
+    def is_complete(self, card_id):
+        return self.hits[card_id] == self.card_sizes[card_id]
+
+    def has_bingo(self, user_id):
+        return user_id in self.winners
+
+    def assign_card(self, card_id, user_id):
+        """Передаёт карточку другому user_id (запись импорта нашла своего игрока)."""
+        self.owners[card_id] = user_id
+        if self.is_complete(card_id):
+            self.winners.add(user_id)
+
+    def _complete(self, card_id):
+        self.completed_cards.append(card_id)
+        self.winners.add(self.owners[card_id])
@@ -0,0 +1,100 @@
+import csv
+import io
+import re
+from collections import Counter
+from bingo import MAX_NUMBER, ROW_SIZE
+from game_state import UNKNOWN_USER_ID
+
+# Разделители в строке импорта: пробелы, запятые, точки с запятой, табуляция
+SEPARATORS = re.compile(r"[\s,;]+")
+MAX_ERRORS_SHOWN = 20
+
+
+def parse_bulk(text, game, privileges):
+    """Разбирает и проверяет записи для массовой регистрации за один проход.
+
+    Строка — "@username 1 2 3 4 5" (для Рулетки — просто "@username"),
+    разделители — пробелы, запятые или точки с запятой, так что подходит и
+    CSV из таблицы, и файл /export ("n,username,user_id,числа").
+    Пользователь ищется по имени среди VIP и уже записанных; незнакомые
+    получают user_id UNKNOWN_USER_ID и лимит обычного игрока.
+    Возвращает (записи [(user_id, username, numbers)], ошибки [текст]);
+    если есть хоть одна ошибка, ни одна запись применяться не должна.
+    """
+    known = {username.lower(): user_id for user_id, username in privileges.vip_users.items()}
+    for entry in game.players:
+        if entry.user_id != UNKNOWN_USER_ID:
+            known.setdefault(entry.username.lower(), entry.user_id)
+
+    entries, errors = [], []
+    for line_no, line in enumerate(text.lstrip("\ufeff").splitlines(), 1):
+        parts = [part for part in SEPARATORS.split(line.strip()) if part]
+        if not parts or parts[0].startswith("/") or parts[0].lower() in ("n", "username", "@username"):
+            continue  # Пустая строка, команда или заголовок CSV
+        user_id = None
+        if len(parts) >= 3 and parts[0].isdigit() and parts[1].startswith("@"):
+            # Строка файла /export: номер, имя, user_id, числа
+            user_id = int(parts[2]) if parts[2].lstrip("-").isdigit() else UNKNOWN_USER_ID
+            parts = parts[1:2] + parts[3:]
+        username = parts[0] if parts[0].startswith("@") else "@" + parts[0]
+        if user_id is None:
+            user_id = known.get(username.lower(), UNKNOWN_USER_ID)
+        if game.active_game == "roulette":
+            if len(parts) != 1:
+                errors.append(f"{line_no}: для Рулетки нужно только имя")
+                continue
+            entries.append((user_id, username, None))
+            continue
+        required = ROW_SIZE - 1 if privileges.is_vip(user_id) or privileges.bonus(game.chat_id, user_id) else ROW_SIZE
+        try:
+            numbers = [int(part) for part in parts[1:]]
+        except ValueError:
+            errors.append(f"{line_no}: все числа должны быть целыми")
+            continue
+        if len(numbers) != required:
+            errors.append(f"{line_no}: у {username} ожидается {required} чисел")
+        elif len(set(numbers)) != len(numbers):
+            errors.append(f"{line_no}: числа повторяются")
+        elif min(numbers) < 1 or max(numbers) > MAX_NUMBER:
+            errors.append(f"{line_no}: числа должны быть от 1 до {MAX_NUMBER}")
+        else:
+            entries.append((user_id, username, numbers))
+
+    # Лимиты записей: известные — по user_id, незнакомые — по имени
+    batch = Counter(user_id if user_id != UNKNOWN_USER_ID else username.lower() for user_id, username, _ in entries)
+    for key, count in batch.items():
+        if isinstance(key, str):
+            existing, limit, name = len(game.imported_entries(key)), 1, key
+        else:
+            existing = game.count_entries(key)
+            limit = 2 if privileges.is_vip(key) else 1 + privileges.bonus(game.chat_id, key)
+            name = privileges.vip_users.get(key) or f"id {key}"
+        if existing + count > limit:
+            errors.append(f"{name}: записей {existing + count}, можно {limit}")
+    return entries, errors
+
+
+def render_errors(errors):
+    shown = errors[:MAX_ERRORS_SHOWN]
+    text = "❌ Импорт отменён, ошибки:\n" + "\n".join(shown)
+    if len(errors) > len(shown):
+        text += f"\n… и ещё {len(errors) - len(shown)}"
+    return text
+
+
+def apply_bulk(game, entries):
+    """Добавляет проверенные записи в игру."""
+    for user_id, username, numbers in entries:
+        game.add_player(user_id, username, numbers)
+
+
+def export_csv(game):
+    """Список игроков игры как CSV-файл в памяти (для send_document)."""
+    text = io.StringIO()
+    writer = csv.writer(text)
+    writer.writerow(["n", "username", "user_id"] + [f"n{idx}" for idx in range(1, ROW_SIZE + 1)])
+    for idx, entry in enumerate(game.players, 1):
+        writer.writerow([idx, entry.username, entry.user_id] + list(entry.packed or ()))
+    data = io.BytesIO(text.getvalue().encode("utf-8-sig"))  # BOM — чтобы Excel понял кириллицу
+    data.name = f"players_{game.active_game or 'game'}.csv"
+    return data
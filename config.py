@@ -2,3 +2,37 @@ BOT_TOKEN = "7989590489:AAFThWdx8VnBGL616k3vHLuz7HgIE4Sp1Yc"
 ADMIN_ID = [6864787140, 7998346757]
 CHAT_IDS = [-1002540317262, -1002540317262]
 DATABASE_URL = "database.db"
+PINNED_EDIT_INTERVAL = 3.0  # Минимальный интервал между правками закреплённого списка в одном чате (сек)
+PERSIST_IN_BACKGROUND = True  # Писать изменения VIP/бонусов в базу из фонового потока
+JOURNAL_SNAPSHOT_EVERY = 1000  # Через сколько записей журнала игры сохранять полный снимок
+SESSION_IDLE_TIMEOUT = 3600  # Через сколько секунд простоя выселять сессию чата без активной игры
+WEBHOOK_URL = ""  # Публичный адрес бота для режима --webhook (пусто — webhook уже настроен)
+WEBHOOK_HOST = "0.0.0.0"
+WEBHOOK_PORT = 8443
+WEBHOOK_SECRET = ""  # Секрет для заголовка X-Telegram-Bot-Api-Secret-Token (пусто — случайный на запуск, нужен WEBHOOK_URL)
+WEBHOOK_WORKERS = 4  # Воркеры обработки; обновления одного чата идут в один воркер
+WEBHOOK_QUEUE_SIZE = 1000  # Ёмкость очереди воркера; при переполнении Telegram получит 503
+OUTBOUND_GLOBAL_RATE = 30  # Исходящих вызовов Telegram в секунду на всего бота
+OUTBOUND_CHAT_RATE = 20 / 60  # Сообщений в секунду в один групповой чат
+OUTBOUND_CHAT_BURST = 5  # Сколько сообщений в чат можно отправить подряд без ожидания
+OUTBOUND_CALLBACK_RATE = 300  # Ответов на нажатия кнопок в секунду; в OUTBOUND_GLOBAL_RATE они не входят
+LOG_LEVEL = "INFO"  # Уровень логов; меняется на лету командой /loglevel
+LOG_SAMPLE_RATES = {"chat_check": 0.01, "admin_check": 0.01}  # Доля записываемых шумных событий уровня DEBUG
+METRICS_HOST = "127.0.0.1"
+METRICS_PORT = 0  # Порт HTTP /metrics в формате Prometheus (0 — не запускать)
+IMPORT_MAX_BYTES = 1_000_000  # Наибольший размер файла для /import
+REGISTRATION_TIMEOUT = 0  # Через сколько секунд после /game закрывать запись (0 — только через /spisok)
+REGISTRATION_MAX_PLAYERS = 0  # После скольких записей закрывать запись (0 — без ограничения)
+BINGO_WINNERS_MAX_MESSAGES = 5  # Сколько сообщений занимает список заполненных рядом карточек; остальные — числом
+ROULETTE_COUNTDOWN = 60  # Сколько секунд ждать после /random до объявления победителя
+GAME_IDLE_TIMEOUT = 6 * 3600  # Через сколько секунд без сообщений сбрасывать незавершённую игру (0 — никогда)
+UPDATE_BACKLOG_POLICY = "skip_stale"  # Накопившиеся при простое обновления: "process", "skip_stale" или "fast_forward"
+UPDATE_MAX_AGE = 120  # Сообщения старше стольких секунд при "skip_stale" не обрабатываются
+WORKER_PROCESSES = 4  # Воркеров в режиме python supervisor.py; чат всегда обрабатывает один и тот же воркер
+WORKER_QUEUE_SIZE = 1000  # Ёмкость очереди воркера; при переполнении обновления его чатов отбрасываются
+FLOOD_USER_RATE = 1.0  # Сообщений "@"/"бинго" и нажатий "Записаться" в секунду от одного пользователя
+FLOOD_USER_BURST = 3  # Сколько таких сообщений пользователь может отправить подряд
+FLOOD_CHAT_RATE = 50  # Отказов и повторов после отказа в секунду на один чат; первые записи игроков не считаются
+FLOOD_CHAT_BURST = 200  # Сколько отказов в чат можно отправить подряд
+FLOOD_REPEAT_WINDOW = 60  # Сколько секунд не повторять пользователю тот же отказ
+OUTBOUND_CONCURRENCY = 8  # Сколько вызовов Telegram выполняется одновременно (вызовы одного чата — по одному)
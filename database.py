@@ -1,60 +1,346 @@
 import sqlite3
-from config import DATABASE_URL  # Импорт DATABASE_URL из config.py
-
-def get_db_connection():
-    """Возвращает подключение к базе данных SQLite."""
-    return sqlite3.connect(DATABASE_URL)
-
-def load_data(game_state):
-    """Загружает данные из базы в game_state."""
-    conn = get_db_connection()
-    cur = conn.cursor()
-    try:
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS vip_users (
-                user_id INTEGER PRIMARY KEY,
-                username TEXT
-            )
-        """)
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS bonus_users (
-                user_id INTEGER PRIMARY KEY,
-                bonus_count INTEGER
+import threading
+import time
+from contextlib import contextmanager
+from config import DATABASE_URL, CHAT_IDS  # Импорт DATABASE_URL из config.py
+from logs import log_event, log_error
+from metrics import metrics
+
+
+def drop_legacy_journal(conn):
+    """Журнал одной игры без chat_id не восстановить по чатам — удаляем его."""
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(game_journal)")]
+    if columns and "chat_id" not in columns:
+        conn.execute("DROP TABLE game_journal")
+        conn.execute("DROP TABLE IF EXISTS game_snapshot")
+
+
+def copy_legacy_bonuses(conn):
+    """Бонусы без chat_id действовали во всех чатах — переносим их в каждый разрешённый чат."""
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'bonus_users'").fetchone():
+        conn.executemany(
+            "INSERT OR IGNORE INTO chat_bonus_users (chat_id, user_id, bonus_count) "
+            "SELECT ?, user_id, bonus_count FROM bonus_users WHERE bonus_count IS NOT NULL",
+            [(chat_id,) for chat_id in CHAT_IDS])
+        conn.execute("DROP TABLE bonus_users")
+
+
+# Версии схемы по порядку: (версия, название, шаги — SQL или функция от подключения).
+# Шаги идемпотентны, поэтому база, созданная до schema_version, проходит их все без потерь.
+# Новую таблицу или индекс добавляем только новой версией в конце списка.
+MIGRATIONS = [
+    (1, "vip_and_bonus", [
+        """CREATE TABLE IF NOT EXISTS vip_users (
+            user_id INTEGER PRIMARY KEY,
+            username TEXT
+        )""",
+        """CREATE TABLE IF NOT EXISTS bonus_users (
+            user_id INTEGER PRIMARY KEY,
+            bonus_count INTEGER
+        )""",
+    ]),
+    (2, "game_journal", [
+        drop_legacy_journal,
+        """CREATE TABLE IF NOT EXISTS game_journal (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            chat_id INTEGER NOT NULL,
+            op TEXT NOT NULL,
+            payload TEXT NOT NULL
+        )""",
+        """CREATE TABLE IF NOT EXISTS game_snapshot (
+            chat_id INTEGER PRIMARY KEY,
+            seq INTEGER NOT NULL,
+            data TEXT NOT NULL
+        )""",
+    ]),
+    (3, "game_history", [
+        """CREATE TABLE IF NOT EXISTS games (
+            game_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            chat_id INTEGER NOT NULL,
+            game_type TEXT NOT NULL,
+            seed INTEGER,
+            started_at REAL,
+            finished_at REAL NOT NULL,
+            entries INTEGER NOT NULL,
+            draws INTEGER NOT NULL
+        )""",
+        """CREATE TABLE IF NOT EXISTS game_entries (
+            game_id INTEGER NOT NULL,
+            position INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            username TEXT NOT NULL,
+            numbers TEXT,
+            won INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (game_id, position)
+        )""",
+        """CREATE TABLE IF NOT EXISTS game_draws (
+            game_id INTEGER NOT NULL,
+            seq INTEGER NOT NULL,
+            numbers TEXT NOT NULL,
+            PRIMARY KEY (game_id, seq)
+        )""",
+        """CREATE TABLE IF NOT EXISTS user_stats (
+            user_id INTEGER PRIMARY KEY,
+            username TEXT NOT NULL,
+            username_key TEXT NOT NULL,
+            games INTEGER NOT NULL DEFAULT 0,
+            entries INTEGER NOT NULL DEFAULT 0,
+            wins INTEGER NOT NULL DEFAULT 0,
+            last_game_at REAL
+        )""",
+        """CREATE TABLE IF NOT EXISTS number_stats (
+            number INTEGER PRIMARY KEY,
+            drawn INTEGER NOT NULL DEFAULT 0,
+            winning INTEGER NOT NULL DEFAULT 0
+        )""",
+        "CREATE INDEX IF NOT EXISTS idx_games_chat ON games (chat_id, finished_at)",
+        "CREATE INDEX IF NOT EXISTS idx_game_entries_user ON game_entries (user_id, game_id)",
+        "CREATE INDEX IF NOT EXISTS idx_user_stats_username ON user_stats (username_key)",
+    ]),
+    (4, "timers", [
+        """CREATE TABLE IF NOT EXISTS timers (
+            chat_id INTEGER NOT NULL,
+            kind TEXT NOT NULL,
+            due_at REAL NOT NULL,
+            payload TEXT NOT NULL,
+            PRIMARY KEY (chat_id, kind)
+        )""",
+    ]),
+    (5, "bot_state", [
+        """CREATE TABLE IF NOT EXISTS bot_state (
+            key TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        )""",
+    ]),
+    (6, "chat_bonuses", [
+        """CREATE TABLE IF NOT EXISTS chat_bonus_users (
+            chat_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            bonus_count INTEGER NOT NULL,
+            PRIMARY KEY (chat_id, user_id)
+        )""",
+        copy_legacy_bonuses,
+    ]),
+]
+
+
+def migrate(conn, migrations=MIGRATIONS):
+    """Применяет недостающие версии схемы, каждую своей транзакцией; возвращает текущую версию."""
+    with conn:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                applied_at REAL NOT NULL
             )
         """)
-        cur.execute("SELECT user_id, username FROM vip_users")
-        game_state["vip_users"] = []
-        rows = cur.fetchall()
-        for row in rows:
-            game_state["vip_users"].append({"user_id": row[0], "username": row[1]})
-        cur.execute("SELECT user_id, bonus_count FROM bonus_users")
-        game_state["bonus_users"] = {}
-        rows = cur.fetchall()
-        for row in rows:
-            game_state["bonus_users"][row[0]] = row[1]
-        conn.commit()
-    except Exception as e:
-        print(f"Ошибка загрузки данных: {e}")
-    finally:
-        cur.close()
-        conn.close()
-
-def save_data(game_state):
-    """Сохраняет данные из game_state в базу."""
-    conn = get_db_connection()
-    cur = conn.cursor()
-    try:
-        cur.execute("DELETE FROM vip_users")
-        for vip in game_state["vip_users"]:
-            cur.execute("INSERT OR REPLACE INTO vip_users (user_id, username) VALUES (?, ?)",
-                       (vip["user_id"], vip["username"]))
-        cur.execute("DELETE FROM bonus_users")
-        for user_id, count in game_state["bonus_users"].items():
-            cur.execute("INSERT OR REPLACE INTO bonus_users (user_id, bonus_count) VALUES (?, ?)",
-                       (user_id, count))
-        conn.commit()
-    except Exception as e:
-        print(f"Ошибка сохранения данных: {e}")
-    finally:
-        cur.close()
-        conn.close()
\ No newline at end of file
+    current = conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+    for version, name, steps in migrations:
+        if version <= current:
+            continue
+        with conn:
+            for step in steps:
+                if callable(step):
+                    step(conn)
+                else:
+                    conn.execute(step)
+            conn.execute("INSERT INTO schema_version (version, name, applied_at) VALUES (?, ?, ?)",
+                         (version, name, time.time()))
+        log_event("schema_migrated", version=version, name=name)
+        current = version
+    return current
+
+
+class Storage:
+    """Единственная точка доступа к SQLite: подключения, схема, VIP и бонусы.
+
+    Подключение для записи одно и долгоживущее (conn, под lock); журнал,
+    архив, таймеры и update_id работают через него же. Открывается оно при
+    первом обращении, тогда же применяются миграции, — поэтому импорт main
+    для тестов и утилит диск не трогает. Запросы статистики идут через
+    reader(): отдельное подключение только для чтения, которое в режиме WAL
+    не ждёт записи. sqlite3 кэширует подготовленные запросы по тексту SQL
+    (cached_statements), поэтому запросы пишутся постоянными строками.
+
+    Изменения VIP и бонусов копятся в памяти (save_vip/delete_vip/save_bonus/
+    clear_bonuses по чату), а flush() записывает только их: upsert и delete через
+    executemany в одной транзакции. С background=True запись делает
+    отдельный поток раз в flush_interval секунд, не блокируя обработчики.
+    После записи данных, общих для всех процессов (VIP, бонусы, архив игр),
+    вызывается on_shared_change — так воркер supervisor.py оповещает остальные.
+    """
+
+    def __init__(self, path=DATABASE_URL, background=False, flush_interval=1.0, cached_statements=256):
+        self.path = path
+        self.cached_statements = cached_statements
+        self._conn = None
+        self._read_conn = None
+        self.connect_lock = threading.Lock()
+        self.lock = threading.Lock()
+        self.read_lock = threading.Lock()
+        self.schema_version = None
+        self.pending_lock = threading.Lock()
+        self.pending_vips = {}  # {user_id: username или None для удаления}
+        self.pending_bonuses = {}  # {(chat_id, user_id): bonus_count или None для удаления}
+        self.cleared_bonus_chats = set()  # Чаты, бонусы которых удаляются целиком
+        self.flush_interval = flush_interval
+        self.on_shared_change = None
+        self.wakeup = threading.Event()
+        self.stopped = threading.Event()
+        self.writer = None
+        if background:
+            self.writer = threading.Thread(target=self._write_loop, name="storage-writer", daemon=True)
+            self.writer.start()
+
+    @property
+    def conn(self):
+        """Подключение для записи; при первом обращении открывается через open()."""
+        if self._conn is None:
+            self.open()
+        return self._conn
+
+    def open(self):
+        """Открывает подключение и применяет миграции, если это ещё не сделано; возвращает версию схемы."""
+        with self.connect_lock:
+            if self._conn is None:
+                conn = self._connect()
+                conn.execute("PRAGMA journal_mode=WAL")
+                self.schema_version = migrate(conn)
+                self._conn = conn
+        return self.schema_version
+
+    @contextmanager
+    def reader(self):
+        """Подключение только для чтения (под read_lock) для запросов статистики."""
+        if self._read_conn is None:
+            self.open()  # Схема должна быть создана до первого чтения
+            with self.connect_lock:
+                if self._read_conn is None:
+                    conn = self._connect()
+                    conn.execute("PRAGMA query_only=ON")
+                    self._read_conn = conn
+        with self.read_lock:
+            yield self._read_conn
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False, cached_statements=self.cached_statements)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def load(self, game_state):
+        """Загружает VIP и бонусы в game_state."""
+        with metrics.timer("sqlite_seconds", op="storage_load"), self.lock:
+            game_state.vip_users = dict(self.conn.execute("SELECT user_id, username FROM vip_users"))
+            bonus_users = {}
+            for chat_id, user_id, count in self.conn.execute(
+                    "SELECT chat_id, user_id, bonus_count FROM chat_bonus_users"):
+                bonus_users.setdefault(chat_id, {})[user_id] = count
+            game_state.bonus_users = bonus_users
+
+    def save_vip(self, user_id, username):
+        with self.pending_lock:
+            self.pending_vips[user_id] = username
+        self._changed()
+
+    def delete_vip(self, user_id):
+        with self.pending_lock:
+            self.pending_vips[user_id] = None
+        self._changed()
+
+    def save_bonus(self, chat_id, user_id, count):
+        with self.pending_lock:
+            self.pending_bonuses[(chat_id, user_id)] = count
+        self._changed()
+
+    def clear_bonuses(self, chat_id):
+        """Удаляет бонусы чата (конец его игры) одним DELETE."""
+        with self.pending_lock:
+            for key in [key for key in self.pending_bonuses if key[0] == chat_id]:
+                del self.pending_bonuses[key]
+            self.cleared_bonus_chats.add(chat_id)
+        self._changed()
+
+    def flush(self):
+        """Записывает накопленные изменения одной транзакцией."""
+        with self.pending_lock:
+            vips, self.pending_vips = self.pending_vips, {}
+            bonuses, self.pending_bonuses = self.pending_bonuses, {}
+            cleared_chats, self.cleared_bonus_chats = self.cleared_bonus_chats, set()
+        if not vips and not bonuses and not cleared_chats:
+            return
+        try:
+            with metrics.timer("sqlite_seconds", op="storage_flush"), self.lock, self.conn:
+                self.conn.executemany(
+                    "INSERT INTO vip_users (user_id, username) VALUES (?, ?) "
+                    "ON CONFLICT(user_id) DO UPDATE SET username = excluded.username",
+                    [(user_id, username) for user_id, username in vips.items() if username is not None])
+                self.conn.executemany(
+                    "DELETE FROM vip_users WHERE user_id = ?",
+                    [(user_id,) for user_id, username in vips.items() if username is None])
+                self.conn.executemany(
+                    "DELETE FROM chat_bonus_users WHERE chat_id = ?",
+                    [(chat_id,) for chat_id in cleared_chats])
+                self.conn.executemany(
+                    "INSERT INTO chat_bonus_users (chat_id, user_id, bonus_count) VALUES (?, ?, ?) "
+                    "ON CONFLICT(chat_id, user_id) DO UPDATE SET bonus_count = excluded.bonus_count",
+                    [(chat_id, user_id, count) for (chat_id, user_id), count in bonuses.items() if count is not None])
+                self.conn.executemany(
+                    "DELETE FROM chat_bonus_users WHERE chat_id = ? AND user_id = ?",
+                    [key for key, count in bonuses.items() if count is None])
+        except Exception as e:
+            log_error("storage_flush_failed", e)
+            self._restore(vips, bonuses, cleared_chats)
+            return
+        self.shared_changed()
+
+    def shared_changed(self):
+        """Сообщает через on_shared_change, что общие для процессов данные записаны."""
+        if self.on_shared_change is not None:
+            try:
+                self.on_shared_change()
+            except Exception as e:
+                log_error("shared_change_notify_failed", e)
+
+    def close(self):
+        """Останавливает фоновую запись, сохраняет остаток и закрывает подключение."""
+        self.stopped.set()
+        self.wakeup.set()
+        if self.writer:
+            self.writer.join()
+        self.flush()
+        with self.connect_lock:
+            if self._read_conn is not None:
+                self._read_conn.close()
+                self._read_conn = None
+        with self.lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _changed(self):
+        if self.writer is None:
+            self.flush()
+        else:
+            self.wakeup.set()
+
+    def _restore(self, vips, bonuses, cleared_chats):
+        # Возвращаем несохранённые изменения, не затирая более новые
+        with self.pending_lock:
+            for user_id, username in vips.items():
+                self.pending_vips.setdefault(user_id, username)
+            for key, count in bonuses.items():
+                # Бонусы чата, очищенного после этой попытки, уже не нужны
+                if key[0] not in self.cleared_bonus_chats:
+                    self.pending_bonuses.setdefault(key, count)
+            self.cleared_bonus_chats |= cleared_chats
+
+    def _write_loop(self):
+        while not self.stopped.is_set():
+            self.wakeup.wait()
+            if self.stopped.is_set():
+                return
+            self.wakeup.clear()
+            self.flush()
+            # Копим изменения, пришедшие за интервал, в одну транзакцию
+            self.stopped.wait(self.flush_interval)
+
@@ -0,0 +1,171 @@
+import threading
+import time
+from concurrent.futures import CancelledError, wait
+from logs import log_error
+from metrics import metrics
+
+
+def get_retry_after(error):
+    """Возвращает retry_after из ошибки 429 Telegram или None."""
+    result = getattr(error, "result_json", None) or {}
+    if getattr(error, "error_code", None) != 429 and result.get("error_code") != 429:
+        return None
+    parameters = result.get("parameters") or {}
+    return parameters.get("retry_after", 1)
+
+
+def is_not_modified(error):
+    """Telegram отвечает 400, если текст сообщения не изменился — это не ошибка."""
+    return "message is not modified" in str(error)
+
+
+class PinnedEditScheduler:
+    """Фоновый планировщик правок закреплённого сообщения.
+
+    Обработчики только помечают чат «грязным» через mark_dirty(), а отдельный
+    поток вызывает flush(chat_id) не чаще одного раза в interval секунд на чат.
+    flush() ставит правки в очередь и возвращает Future (None — править нечего),
+    а результат разбирается в его колбэке, поэтому поток не ждёт лимитов
+    Telegram и медленный чат не задерживает правки других. Пока правка чата
+    не завершилась, следующая для него не начинается.
+    Серия записей схлопывается в одну правку, и последнее состояние всегда
+    отправляется: если чат помечен во время правки, он будет обновлён ещё раз.
+    """
+
+    def __init__(self, flush, interval=3.0):
+        self.flush = flush
+        self.interval = interval
+        self.dirty = {}  # {chat_id: время, раньше которого нельзя править}
+        self.next_allowed = {}  # {chat_id: время следующей разрешённой правки}
+        self.flushing = {}  # {chat_id: Future ещё не завершённой правки}
+        self.condition = threading.Condition()
+        self.thread = None
+        self.stopped = False
+        self.edits_requested = 0
+        self.edits_sent = 0
+        self.edits_failed = 0
+        self.rate_limited = 0
+
+    def mark_dirty(self, chat_id):
+        """Помечает список чата устаревшим; правка уйдёт в фоне."""
+        with self.condition:
+            self.edits_requested += 1
+            if chat_id not in self.dirty:
+                self.dirty[chat_id] = self.next_allowed.get(chat_id, 0)
+            self._ensure_thread()
+            self.condition.notify()
+
+    def forget(self, chat_id):
+        """Забывает чат (его сессия выселена), если правок для него не ждёт и не выполняется."""
+        with self.condition:
+            if chat_id not in self.dirty and chat_id not in self.flushing:
+                self.next_allowed.pop(chat_id, None)
+
+    def stats(self):
+        """Счётчики: сколько правок запрошено и сколько реально отправлено."""
+        with self.condition:
+            return {
+                "requested": self.edits_requested,
+                "sent": self.edits_sent,
+                "coalesced": self.edits_requested - self.edits_sent - self.edits_failed - len(self.dirty)
+                - len(self.flushing),
+                "failed": self.edits_failed,
+                "rate_limited": self.rate_limited,
+                "pending": len(self.dirty) + len(self.flushing),
+            }
+
+    def flush_all(self, timeout=5):
+        """Отправляет все отложенные правки и ждёт их не дольше timeout (при остановке бота).
+
+        Чат, чья правка ещё выполняется, сначала дожидается её, чтобы новые
+        страницы не отправились дважды.
+        """
+        deadline = time.monotonic() + timeout
+        self._wait_flushing(deadline)
+        with self.condition:
+            pending = [chat_id for chat_id in self.dirty if chat_id not in self.flushing]
+            for chat_id in pending:
+                del self.dirty[chat_id]
+        for chat_id in pending:
+            self._flush(chat_id)
+        self._wait_flushing(deadline)
+
+    def stop(self, timeout=5):
+        with self.condition:
+            self.stopped = True
+            self.condition.notify()
+        if self.thread:
+            self.thread.join()
+        self.flush_all(timeout)
+
+    def _wait_flushing(self, deadline):
+        with self.condition:
+            futures = list(self.flushing.values())
+        wait(futures, timeout=max(0, deadline - time.monotonic()))
+
+    def _ensure_thread(self):
+        if self.thread is None and not self.stopped:
+            self.thread = threading.Thread(target=self._run, name="pinned-edits", daemon=True)
+            self.thread.start()
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while not self.stopped:
+                    now = time.monotonic()
+                    ready = [chat_id for chat_id, due in self.dirty.items()
+                             if due <= now and chat_id not in self.flushing]
+                    if ready:
+                        break
+                    waiting = [due for chat_id, due in self.dirty.items() if chat_id not in self.flushing]
+                    self.condition.wait(min(waiting) - now if waiting else None)
+                if self.stopped:
+                    return
+                for chat_id in ready:
+                    del self.dirty[chat_id]
+                    self.next_allowed[chat_id] = now + self.interval
+            for chat_id in ready:
+                self._flush(chat_id)
+
+    def _flush(self, chat_id):
+        started = time.perf_counter()
+        try:
+            future = self.flush(chat_id)
+        except Exception as e:
+            self._flushed(chat_id, started, e)
+            return
+        if future is None:
+            self._flushed(chat_id, started, None)
+            return
+        with self.condition:
+            self.flushing[chat_id] = future
+        future.add_done_callback(lambda done: self._flushed(chat_id, started, future_error(done)))
+
+    def _flushed(self, chat_id, started, error):
+        metrics.observe("pinned_flush_seconds", time.perf_counter() - started)
+        with self.condition:
+            self.flushing.pop(chat_id, None)
+            self.condition.notify()
+            if error is None:
+                self.edits_sent += 1
+                return
+            retry_after = get_retry_after(error)
+            if retry_after is not None:
+                # Лимит Telegram: откладываем правку, а не теряем её
+                self.rate_limited += 1
+                due = time.monotonic() + retry_after
+                self.next_allowed[chat_id] = due
+                self.dirty[chat_id] = max(self.dirty.get(chat_id, 0), due)
+                return
+            if is_not_modified(error):
+                self.edits_sent += 1
+                return
+            self.edits_failed += 1
+        log_error("pinned_edit_failed", error, chat_id=chat_id)
+
+
+def future_error(future):
+    """Ошибка завершённого Future или None."""
+    if future.cancelled():
+        return CancelledError()
+    return future.exception()
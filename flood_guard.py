@@ -0,0 +1,106 @@
+import threading
+import time
+from collections import OrderedDict
+from outbound import TokenBucket
+from metrics import metrics
+
+
+class FloodGuard:
+    """Защита от флуда "@", "бинго" и кнопкой записи.
+
+    allow() берёт токен из ведра пользователя; если токена нет, сообщение
+    молча отбрасывается ещё до подсчёта записей и ответа. first_rejection()
+    помнит последний отказ пользователю: тот же отказ в течение
+    repeat_window секунд повторно не отправляется, forget() сбрасывает его
+    после успешной записи. Ведро чата тратят только отказы и сообщения
+    пользователей, недавно получивших отказ, — первая запись каждого игрока
+    его не касается, поэтому массовая запись в начале игры не режется, а
+    волна повторов и ответов об ошибках в одном чате ограничена. Вёдра и
+    отказы хранятся в LRU на max_users пользователей и max_chats чатов,
+    поэтому память не растёт с числом флудеров. Счётчики — в stats() и
+    метриках flood_dropped_total и flood_replies_suppressed_total.
+    """
+
+    def __init__(self, user_rate=1.0, user_burst=3, chat_rate=50, chat_burst=200, repeat_window=60,
+                 max_users=10000, max_chats=1000):
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.repeat_window = repeat_window
+        self.max_users = max_users
+        self.max_chats = max_chats
+        self.users = OrderedDict()  # {user_id: [TokenBucket, последний отказ, его time.monotonic()]}
+        self.chats = OrderedDict()  # {chat_id: TokenBucket}
+        self.lock = threading.Lock()
+        self.dropped = {"user": 0, "chat": 0}
+        self.suppressed = 0
+
+    def allow(self, chat_id, user_id):
+        """Пропустить ли сообщение; False — отбросить без ответа."""
+        now = time.monotonic()
+        with self.lock:
+            state = self._user(user_id)
+            if state[0].reserve(now):
+                scope = "user"
+            elif self._rejected_recently(state, now) and self._chat(chat_id).reserve(now):
+                scope = "chat"
+            else:
+                return True
+            self.dropped[scope] += 1
+        metrics.inc("flood_dropped_total", scope=scope)
+        return False
+
+    def first_rejection(self, chat_id, user_id, reason):
+        """Отвечать ли отказом reason; False — тот же отказ недавно уже отправлен или чат исчерпал лимит."""
+        now = time.monotonic()
+        with self.lock:
+            state = self._user(user_id)
+            if state[1] == reason and self._rejected_recently(state, now):
+                self.suppressed += 1
+                repeated = True
+            elif self._chat(chat_id).reserve(now):
+                # Лимит отказов чата: не отвечаем и не запоминаем, следующий повтор попробует снова
+                self.suppressed += 1
+                repeated = True
+            else:
+                state[1], state[2] = reason, now
+                repeated = False
+        if repeated:
+            metrics.inc("flood_replies_suppressed_total")
+        return not repeated
+
+    def forget(self, user_id):
+        """Сбрасывает запомненный отказ (пользователь успешно записался)."""
+        with self.lock:
+            state = self.users.get(user_id)
+            if state is not None:
+                state[1] = None
+
+    def stats(self):
+        with self.lock:
+            return {"dropped_user": self.dropped["user"], "dropped_chat": self.dropped["chat"],
+                    "suppressed": self.suppressed, "users": len(self.users)}
+
+    def _rejected_recently(self, state, now):
+        return state[1] is not None and now - state[2] < self.repeat_window
+
+    def _user(self, user_id):
+        state = self.users.get(user_id)
+        if state is None:
+            state = self.users[user_id] = [TokenBucket(self.user_rate, self.user_burst), None, 0.0]
+            if len(self.users) > self.max_users:
+                self.users.popitem(last=False)
+        else:
+            self.users.move_to_end(user_id)
+        return state
+
+    def _chat(self, chat_id):
+        bucket = self.chats.get(chat_id)
+        if bucket is None:
+            bucket = self.chats[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+            if len(self.chats) > self.max_chats:
+                self.chats.popitem(last=False)
+        else:
+            self.chats.move_to_end(chat_id)
+        return bucket
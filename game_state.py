@@ -0,0 +1,246 @@
+import sys
+import threading
+import time
+from collections import OrderedDict
+from bingo import BingoEngine, DrawDeck, ROW_SIZE
+from renderer import PlayerListRenderer
+
+# user_id записей из массового импорта, чей пользователь боту не известен
+UNKNOWN_USER_ID = 0
+
+
+class Entry:
+    """Запись игрока в игре.
+
+    Слоты вместо словаря, числа карточки упакованы в bytes по байту на число
+    (uint8, числа Бинго — 1..100), имя берётся из общей таблицы sys.intern:
+    все записи одного игрока во всех чатах ссылаются на одну строку.
+    У записи Рулетки packed и card_id — None.
+    """
+
+    __slots__ = ("user_id", "username", "packed", "card_id")
+
+    def __init__(self, user_id, username, numbers=None, card_id=None):
+        self.user_id = user_id
+        self.username = sys.intern(username)
+        self.packed = bytes(numbers) if numbers is not None else None
+        self.card_id = card_id
+
+    @property
+    def numbers(self):
+        """Числа карточки списком или None."""
+        return list(self.packed) if self.packed is not None else None
+
+
+class GameState:
+    """Состояние игры одного чата с индексами для проверок за O(1).
+
+    players — упорядоченный список записей Entry,
+    entries_by_user — те же записи, сгруппированные по user_id,
+    imported_by_name — записи незнакомых пользователей из импорта по имени,
+        пока claim_imported() не привяжет их к user_id игрока,
+    bingo — движок Бинго с карточками игроков и выпавшими числами,
+    deck — колода, из которой сдаются ряды этой игры,
+    cards — записи Бинго по card_id движка,
+    player_list — готовые строки закреплённого списка по страницам.
+    Все изменения идут через методы, чтобы индексы не расходились со списком.
+    """
+
+    def __init__(self, chat_id=None):
+        self.chat_id = chat_id  # Чат, в котором идёт игра
+        self.active_game = None  # "bingo" или "roulette"
+        self.registration_open = False
+        self.started_at = None  # Время начала игры (time.time())
+        self.pinned_message_id = None
+        self.page_message_ids = []  # Сообщения со 2-й и следующих страниц списка
+        self.players = []
+        self.entries_by_user = {}
+        self.imported_by_name = {}
+        self.bingo_numbers = []  # Выпавшие ряды в порядке выдачи
+        self.bingo = BingoEngine()
+        self.deck = DrawDeck()
+        self.cards = []
+        self.player_list = PlayerListRenderer()
+        self.last_activity = time.monotonic()
+
+    def start(self, game, seed=None, started_at=None):
+        """Начинает новую игру, очищая записи и выпавшие числа; seed задаёт колоду."""
+        self.reset()
+        self.active_game = game
+        self.registration_open = True
+        self.started_at = started_at or time.time()
+        self.deck.shuffle(seed)
+
+    def reset(self):
+        """Сбрасывает текущую игру чата."""
+        # Список первым: отправка страниц старой игры сверяется с его generation
+        self.player_list.reset()
+        self.active_game = None
+        self.registration_open = False
+        self.started_at = None
+        self.pinned_message_id = None
+        self.page_message_ids = []
+        self.players = []
+        self.entries_by_user = {}
+        self.imported_by_name = {}
+        self.bingo_numbers = []
+        self.bingo.reset()
+        self.cards = []
+
+    def add_player(self, user_id, username, numbers=None):
+        entry = Entry(user_id, username)
+        if numbers is not None:
+            entry.packed = bytes(numbers)
+            entry.card_id = self.bingo.add_card(user_id, numbers)
+            self.cards.append(entry)
+        self.players.append(entry)
+        self.entries_by_user.setdefault(user_id, []).append(entry)
+        if user_id == UNKNOWN_USER_ID:
+            self.imported_by_name.setdefault(username.lower(), []).append(entry)
+        self.player_list.append(entry)
+        return entry
+
+    def entries_of(self, user_id):
+        return self.entries_by_user.get(user_id, [])
+
+    def imported_entries(self, username):
+        """Записи из импорта без user_id, сделанные на это имя."""
+        return self.imported_by_name.get(username.lower(), [])
+
+    def claim_imported(self, user_id, username):
+        """Привязывает записи импорта на имя username к user_id; возвращает их число."""
+        claimed = self.imported_by_name.pop(username.lower(), None)
+        if not claimed:
+            return 0
+        ids = {id(entry) for entry in claimed}
+        unknown = [entry for entry in self.entries_by_user.get(UNKNOWN_USER_ID, ()) if id(entry) not in ids]
+        if unknown:
+            self.entries_by_user[UNKNOWN_USER_ID] = unknown
+        else:
+            self.entries_by_user.pop(UNKNOWN_USER_ID, None)
+        own = self.entries_by_user.setdefault(user_id, [])
+        for entry in claimed:
+            entry.user_id = user_id
+            own.append(entry)
+            if entry.card_id is not None:
+                self.bingo.assign_card(entry.card_id, user_id)
+        return len(claimed)
+
+    def count_entries(self, user_id):
+        return len(self.entries_by_user.get(user_id, ()))
+
+    def add_bingo_row(self, row):
+        """Добавляет выпавший ряд; возвращает только что заполненные записи."""
+        self.bingo_numbers.append(row)
+        return [self.cards[card_id] for card_id in self.bingo.draw(row)]
+
+    def draw_row(self):
+        """Сдаёт следующий ряд из колоды; пустой ряд — числа кончились."""
+        return self.deck.deal(ROW_SIZE, self.bingo.is_drawn)
+
+    def has_bingo(self, user_id):
+        """Есть ли у пользователя заполненная карточка (импортированные — после claim_imported())."""
+        return self.bingo.has_bingo(user_id)
+
+
+class Privileges:
+    """VIP — общие для всех чатов, бонусы — на игру своего чата.
+
+    vip_users — {user_id: username} в порядке назначения,
+    bonus_users — {chat_id: {user_id: количество_доп_записей}}.
+    """
+
+    def __init__(self):
+        self.vip_users = {}
+        self.bonus_users = {}
+
+    def is_vip(self, user_id):
+        return user_id in self.vip_users
+
+    def bonus(self, chat_id, user_id):
+        """Дополнительные записи пользователя в игре чата (0 — бонуса нет)."""
+        return self.bonus_users.get(chat_id, {}).get(user_id, 0)
+
+    def add_bonus(self, chat_id, user_id, count):
+        self.bonus_users.setdefault(chat_id, {})[user_id] = count
+
+    def clear_bonuses(self, chat_id):
+        """Снимает бонусы игры чата (конец игры); бонусы других чатов остаются."""
+        self.bonus_users.pop(chat_id, None)
+
+    def add_vip(self, user_id, username):
+        """Добавляет VIP; возвращает False, если пользователь уже VIP."""
+        if user_id in self.vip_users:
+            return False
+        self.vip_users[user_id] = username
+        return True
+
+    def remove_vip(self, user_id):
+        """Удаляет VIP; возвращает False, если пользователь не был VIP."""
+        if user_id not in self.vip_users:
+            return False
+        del self.vip_users[user_id]
+        return True
+
+
+class SessionRegistry:
+    """Игры по чатам: {chat_id: GameState}.
+
+    Сессия создаётся при первом обращении к чату. Сессии хранятся в порядке
+    последней активности, поэтому get() за один проход по началу словаря
+    выселяет чаты без игры, простаивающие дольше idle_timeout секунд.
+    Чаты с активной игрой не выселяются: их состояние нужно до /stop.
+    on_evict(chat_id) вызывается после выселения, уже без блокировки реестра,
+    чтобы другие модули забыли свои данные этого чата.
+    """
+
+    def __init__(self, idle_timeout=3600):
+        self.idle_timeout = idle_timeout
+        self.sessions = OrderedDict()
+        self.lock = threading.Lock()
+        self.on_evict = None
+
+    def get(self, chat_id):
+        """Возвращает игру чата, создавая её при необходимости."""
+        now = time.monotonic()
+        with self.lock:
+            game = self.sessions.get(chat_id)
+            if game is None:
+                game = GameState(chat_id)
+                self.sessions[chat_id] = game
+            else:
+                self.sessions.move_to_end(chat_id)
+            game.last_activity = now
+            evicted = self._evict_idle(now)
+        if self.on_evict is not None:
+            for evicted_chat_id in evicted:
+                self.on_evict(evicted_chat_id)
+        return game
+
+    def find(self, chat_id):
+        """Возвращает игру чата без создания и без отметки активности."""
+        return self.sessions.get(chat_id)
+
+    def active(self):
+        """Сессии с запущенной игрой."""
+        with self.lock:
+            return [game for game in self.sessions.values() if game.active_game]
+
+    def __len__(self):
+        return len(self.sessions)
+
+    def _evict_idle(self, now):
+        cutoff = now - self.idle_timeout
+        idle, evicted = [], []
+        for chat_id, game in self.sessions.items():
+            if game.last_activity >= cutoff:
+                break
+            idle.append(chat_id)
+        for chat_id in idle:
+            if self.sessions[chat_id].active_game:
+                # Игру не трогаем, но и не проверяем её на каждом вызове
+                self.sessions.move_to_end(chat_id)
+            else:
+                del self.sessions[chat_id]
+                evicted.append(chat_id)
+        return evicted
@@ -0,0 +1,1091 @@
+from telebot.types import InlineKeyboardMarkup, InlineKeyboardButton
+import logging
+import random
+import threading
+import time
+from collections import defaultdict
+from config import ADMIN_ID, CHAT_IDS, DATABASE_URL, PINNED_EDIT_INTERVAL, PERSIST_IN_BACKGROUND, JOURNAL_SNAPSHOT_EVERY, SESSION_IDLE_TIMEOUT
+from config import OUTBOUND_GLOBAL_RATE, OUTBOUND_CHAT_RATE, OUTBOUND_CHAT_BURST, OUTBOUND_CONCURRENCY, OUTBOUND_CALLBACK_RATE
+from config import LOG_LEVEL, LOG_SAMPLE_RATES, IMPORT_MAX_BYTES
+from config import REGISTRATION_TIMEOUT, REGISTRATION_MAX_PLAYERS, ROULETTE_COUNTDOWN, GAME_IDLE_TIMEOUT
+from config import BINGO_WINNERS_MAX_MESSAGES
+from config import UPDATE_BACKLOG_POLICY, UPDATE_MAX_AGE
+from config import FLOOD_USER_RATE, FLOOD_USER_BURST, FLOOD_CHAT_RATE, FLOOD_CHAT_BURST, FLOOD_REPEAT_WINDOW
+from database import Storage
+from journal import GameJournal
+from history import GameHistory
+from leaderboard import Leaderboard
+from timers import TimerScheduler
+from updates import UpdateTracker
+from edit_scheduler import PinnedEditScheduler
+from outbound import OutboundDispatcher, PRIORITY_CALLBACK, PRIORITY_ANNOUNCE, PRIORITY_REPLY, PRIORITY_ERROR
+from flood_guard import FloodGuard
+from game_state import Privileges, SessionRegistry
+from bingo import MAX_NUMBER, ROW_SIZE
+from renderer import flush_pages, split_messages
+from router import UpdateRouter
+from logs import setup_logging, set_level, get_level, log_event, log_error
+from metrics import metrics
+from bulk import parse_bulk, render_errors, apply_bulk, export_csv
+
+# Логика игр и команд, общая для main.py (TeleBot) и async_main.py (AsyncTeleBot).
+# Обработчики здесь обычные функции: состояние меняют под блокировкой чата,
+# а Telegram вызывают только через очередь outbound, которая сама выполняет
+# и методы TeleBot, и корутины AsyncTeleBot. Бота подставляет режим запуска
+# через bind_bot(); импорт модуля бота не создаёт.
+
+# Логи пишутся фоновым потоком, шумные проверки — с выборкой
+setup_logging(LOG_LEVEL, LOG_SAMPLE_RATES)
+
+# Бот режима запуска: TeleBot или AsyncTeleBot
+bot = None
+
+def bind_bot(telegram_bot):
+    global bot
+    bot = telegram_bot
+
+# Очередь исходящих вызовов с лимитами Telegram
+outbound = OutboundDispatcher(global_rate=OUTBOUND_GLOBAL_RATE, chat_rate=OUTBOUND_CHAT_RATE,
+                              chat_burst=OUTBOUND_CHAT_BURST, concurrency=OUTBOUND_CONCURRENCY,
+                              callback_rate=OUTBOUND_CALLBACK_RATE)
+
+# Ответ на нажатие кнопки — раньше всех, без лимита чата и вне общего лимита сообщений.
+# Время от прихода нажатия до ответа Telegram — в гистограмму callback_answer_seconds
+def answer_callback(call, text=None):
+    future = outbound.submit(PRIORITY_CALLBACK, bot.answer_callback_query, call.id, text)
+    received_at = getattr(call, "received_at", None)
+    if received_at is not None:
+        future.add_done_callback(
+            lambda _: metrics.observe("callback_answer_seconds", time.perf_counter() - received_at))
+
+# Сообщение в чат через очередь
+def send(chat_id, text, priority=PRIORITY_REPLY, **kwargs):
+    outbound.submit(priority, bot.send_message, chat_id, text, chat_id=chat_id, **kwargs)
+
+# Объявление игры: уходит раньше обычных ответов
+def announce(chat_id, text, **kwargs):
+    send(chat_id, text, priority=PRIORITY_ANNOUNCE, **kwargs)
+
+# Ответ на сообщение
+def reply(message, text, **kwargs):
+    outbound.submit(PRIORITY_REPLY, bot.reply_to, message, text, chat_id=message.chat.id, **kwargs)
+
+# Ответ об ошибке: уходит последним, неотправленные ошибки одному пользователю склеиваются
+def reply_error(message, text):
+    outbound.submit(PRIORITY_ERROR, bot.reply_to, message, text, chat_id=message.chat.id,
+                    fold_key=(message.chat.id, message.from_user.id))
+
+# Защита от флуда "@", "бинго" и кнопкой записи: лишнее отбрасывается до обработчика,
+# тот же отказ тому же пользователю повторно не отправляется
+flood_guard = FloodGuard(user_rate=FLOOD_USER_RATE, user_burst=FLOOD_USER_BURST, chat_rate=FLOOD_CHAT_RATE,
+                         chat_burst=FLOOD_CHAT_BURST, repeat_window=FLOOD_REPEAT_WINDOW)
+
+# Ответ об отказе игроку: повтор того же отказа не отправляется
+def reply_rejection(message, text):
+    if flood_guard.first_rejection(message.chat.id, message.from_user.id, text):
+        reply_error(message, text)
+
+# Ответ на нажатие с отказом: повтор того же отказа — без текста
+def answer_rejection(call, text):
+    chat_id = call.message.chat.id
+    answer_callback(call, text if flood_guard.first_rejection(chat_id, call.from_user.id, text) else None)
+
+# Игры по чатам и общие для всех чатов VIP и бонусы
+sessions = SessionRegistry(idle_timeout=SESSION_IDLE_TIMEOUT)
+privileges = Privileges()
+
+# Блокировки изменений игры по чатам: обработчики выполняются в пуле потоков
+# (telebot или async_main), таймеры — в своём потоке, и изменения одной игры
+# не должны перемешиваться
+chat_locks = defaultdict(threading.Lock)
+
+# Выселенная сессия: забываем остальные данные чата, чтобы они не копились.
+# Блокировку чата удаляем, только если её сейчас никто не держит
+def forget_chat(chat_id):
+    lock = chat_locks.get(chat_id)
+    if lock is not None and lock.acquire(blocking=False):
+        chat_locks.pop(chat_id, None)
+        lock.release()
+    edit_scheduler.forget(chat_id)
+    outbound.forget_chat(chat_id)
+
+sessions.on_evict = forget_chat
+
+# Идёт ли в чате игра (сообщения игроков нужны только во время игры)
+def is_game_running(chat_id):
+    game = sessions.find(chat_id)
+    return game is not None and game.active_game is not None
+
+# Маршрутизатор: команды, "@" и "бинго" разбираются за один проход по тексту;
+# фильтры и вызов dispatch() регистрирует режим запуска
+router = UpdateRouter(game_active=is_game_running)
+
+# Разрешённые чаты и админы
+ALLOWED_CHATS = frozenset(CHAT_IDS)
+ADMINS = frozenset(ADMIN_ID)
+
+# Проверка, что команда отправлена в нужном чате
+def is_valid_chat(chat_id):
+    allowed = chat_id in ALLOWED_CHATS
+    log_event("chat_check", logging.DEBUG, chat_id=chat_id, allowed=allowed)
+    return allowed
+
+# Хранилище: база открывается и обновляет схему при первом обращении, а не при импорте
+storage = Storage(DATABASE_URL, background=PERSIST_IN_BACKGROUND)
+
+# Журнал игр для восстановления после перезапуска
+journal = GameJournal(storage, snapshot_every=JOURNAL_SNAPSHOT_EVERY)
+
+# Архив завершённых игр со статистикой игроков и чисел
+history = GameHistory(storage)
+
+# Рейтинг для /top: в памяти, пересчитывается по концу игры и смене VIP
+leaderboard = Leaderboard()
+
+# Таймеры игр: автозакрытие записи, автовыдача рядов, итог рулетки, простой
+timers = TimerScheduler(storage)
+
+# Последний принятый update_id: опрос после перезапуска продолжается с него,
+# повторы и устаревшие сообщения отбрасываются до обработчиков
+update_tracker = UpdateTracker(storage, policy=UPDATE_BACKLOG_POLICY, max_age=UPDATE_MAX_AGE)
+
+# Проверка, является ли пользователь админом
+def is_admin(user_id):
+    allowed = user_id in ADMINS
+    log_event("admin_check", logging.DEBUG, user_id=user_id, allowed=allowed)
+    return allowed
+
+# Проверка, является ли пользователь VIP
+def is_vip(user_id):
+    return privileges.is_vip(user_id)
+
+# Подсчёт количества записей пользователя в игре
+def count_entries(game, user_id):
+    return game.count_entries(user_id)
+
+# Сколько раз пользователь может записаться в игру чата
+def max_entries_for(chat_id, user_id):
+    return 2 if is_vip(user_id) else (1 + privileges.bonus(chat_id, user_id))
+
+# Имя пользователя для списков: @username или имя
+def display_name(user):
+    return f"@{user.username or user.first_name}"
+
+# Привязка записей импорта на @username к user_id при первом обращении игрока.
+# Только по username Telegram: имя, которое подставляет display_name(), выбирает себе кто угодно
+def claim_imported(game, user):
+    if not user.username or not game.imported_by_name:
+        return
+    username = f"@{user.username}"
+    if game.claim_imported(user.id, username):
+        journal.record(game, "claim", user_id=user.id, username=username)
+        log_event("imported_claimed", chat_id=game.chat_id, user_id=user.id)
+
+# Разбор записи на Бинго: возвращает (username, numbers, текст ошибки)
+def parse_bingo_entry(text, chat_id, user_id, username):
+    parts = text.strip().split()
+    required_numbers = 4 if (is_vip(user_id) or privileges.bonus(chat_id, user_id)) else 5
+    if parts[0] == "@":
+        # Формат: @ 1 2 3 4 5
+        if len(parts) != required_numbers + 1:
+            return None, None, f"❌ Ожидается {required_numbers} чисел! Пример: @ 1 2 3 4{' 5' if required_numbers == 5 else ''}"
+        username_to_save = username  # Используем username отправителя
+    else:
+        # Формат: @username 1 2 3 4 5
+        if len(parts) != required_numbers + 2:  # +2, т.к. есть @username и числа
+            return None, None, f"❌ Ожидается {required_numbers} чисел после @username! Пример: @username 1 2 3 4{' 5' if required_numbers == 5 else ''}"
+        username_to_save = parts[0]  # Используем указанный @username
+    parts = parts[1:]  # Убираем @ или @username из списка для обработки чисел
+
+    try:
+        numbers = [int(x) for x in parts]
+    except ValueError:
+        return None, None, "❌ Все числа должны быть целыми!"
+    # Проверка на дубликаты
+    if len(set(numbers)) != len(numbers):
+        return None, None, "❌ Цифры повторяются! Выберите уникальные числа."
+    # Проверка диапазона чисел
+    for x in numbers:
+        if x < 1 or x > 100:
+            return None, None, "❌ Числа должны быть от 1 до 100!"
+    return username_to_save, numbers, None
+
+# Сдача до count рядов из колоды игры; возвращает (ряды, заполненные записи)
+def draw_rows(game, count):
+    rows, winners = [], []
+    for _ in range(count):
+        row = game.draw_row()
+        if not row:
+            break
+        winners.extend(game.add_bingo_row(row))
+        rows.append(row)
+    return rows, winners
+
+# Текст только что выпавших рядов и короткая сводка игры
+def render_bingo_draw(game, rows):
+    first = len(game.bingo_numbers) - len(rows) + 1
+    lines = [f"🎲 Ряд {first + idx}: {' | '.join(map(str, row))}" for idx, row in enumerate(rows)]
+    drawn = game.bingo.drawn_count()
+    summary = f"📊 Выпало {drawn} из {MAX_NUMBER}, заполнено карточек: {len(game.bingo.completed_cards)}"
+    if drawn == MAX_NUMBER:
+        summary += "\n🏁 Все числа выпали!"
+    else:
+        summary += f", осталось рядов: {-(-(MAX_NUMBER - drawn) // ROW_SIZE)}"
+    return "\n".join(lines) + "\n\n" + summary
+
+# Объявление карточек, заполненных последним рядом: сообщения не длиннее лимита Telegram,
+# не больше BINGO_WINNERS_MAX_MESSAGES штук, не вошедшие карточки — числом в конце
+def render_bingo_winners(winners):
+    lines = [f"{entry.card_id + 1}. {entry.username} {' '.join(map(str, entry.packed))}\n" for entry in winners]
+    messages = split_messages(lines, winners_header)
+    if len(messages) > BINGO_WINNERS_MAX_MESSAGES:
+        messages = messages[:BINGO_WINNERS_MAX_MESSAGES]
+        listed = sum(text.count("\n") - 2 for text in messages)
+        messages[-1] += f"\n…и ещё {len(winners) - listed} карточек"
+    return messages
+
+def winners_header(part):
+    return "🎉 Бинго! Заполнены карточки:\n\n" if part == 0 else f"🎉 Бинго! Заполнены карточки (часть {part + 1}):\n\n"
+
+# Кого смотреть в /userstats: ответ на сообщение, @username или user_id, иначе автора
+def stats_target(message):
+    if message.reply_to_message:
+        return message.reply_to_message.from_user.id
+    parts = message.text.split()
+    if len(parts) < 2:
+        return message.from_user.id
+    target = parts[1]
+    if target.lstrip("-").isdigit():
+        return int(target)
+    return target if target.startswith("@") else "@" + target
+
+# Текст /userstats по строке user_stats архива
+def render_user_stats(target, row):
+    if row is None:
+        return f"📈 {target} ещё не играл ни в одной завершённой игре."
+    username, games, entries, wins = row
+    return (f"📈 Статистика {username}:\n"
+            f"- Игр: {games}\n"
+            f"- Записей: {entries}\n"
+            f"- Побед в Бинго: {wins} ({wins / games:.0%} игр)")
+
+# Текст /numstats: числа, чаще всего бывшие в выигравших карточках
+def render_top_numbers(rows, games):
+    if not rows:
+        return "🔢 В архиве ещё нет завершённых игр Бинго."
+    lines = [f"🔢 Числа в выигравших карточках (игр в архиве: {games}):", ""]
+    for number, drawn, winning in rows:
+        lines.append(f"{number}: в победах {winning} раз, выпадало {drawn} раз")
+    return "\n".join(lines)
+
+# Клавиатура закреплённого списка: кнопка записи только на открытую рулетку
+def pinned_keyboard(game):
+    return register_button() if game.active_game == "roulette" and game.registration_open else None
+
+# Создание инлайн-клавиатуры для выбора игры
+def game_selection_keyboard():
+    keyboard = InlineKeyboardMarkup()
+    keyboard.add(InlineKeyboardButton("🎲 Бинго", callback_data="bingo"))
+    keyboard.add(InlineKeyboardButton("🎰 Рулетка", callback_data="roulette"))
+    return keyboard
+
+# Создание инлайн-клавиатуры для записи
+def register_button():
+    keyboard = InlineKeyboardMarkup()
+    keyboard.add(InlineKeyboardButton("📝 Записаться", callback_data="register"))
+    return keyboard
+
+# Правка изменённых страниц списка игроков (вызывается планировщиком в фоне):
+# вызовы ставятся в очередь, планировщик получает Future и не ждёт лимитов чата
+def flush_pinned_message(chat_id):
+    game = sessions.find(chat_id)
+    if not game or not game.pinned_message_id:
+        return None
+
+    def edit_page(page, message_id, text):
+        return outbound.submit(PRIORITY_ANNOUNCE, bot.edit_message_text, text, chat_id, message_id,
+                               chat_id=chat_id, reply_markup=pinned_keyboard(game) if page == 0 else None)
+
+    def send_page(text):
+        # Продолжение списка — ответом на закреплённое сообщение
+        return outbound.submit(PRIORITY_ANNOUNCE, bot.send_message, chat_id, text,
+                               chat_id=chat_id, reply_to_message_id=game.pinned_message_id)
+
+    def record_page(message_id):
+        journal.record(game, "page", message_id=message_id)
+
+    return flush_pages(game, edit_page, send_page, record_page)
+
+# Планировщик правок: не больше одной правки в PINNED_EDIT_INTERVAL секунд на чат
+edit_scheduler = PinnedEditScheduler(flush_pinned_message, interval=PINNED_EDIT_INTERVAL)
+
+# Списки, которые уже отправляются и закрепляются: {(chat_id, generation списка)}
+pinning = set()
+
+# Обновление закреплённого сообщения: правка уходит в планировщик, а первая
+# отправка с закреплением — в очередь, результат разбирают колбэки.
+# Вызывается под блокировкой чата, поэтому список не отправляется дважды
+def update_pinned_message(chat_id):
+    game = sessions.get(chat_id)
+    if game.pinned_message_id:
+        edit_scheduler.mark_dirty(chat_id)
+        return
+    generation = game.player_list.generation
+    if (chat_id, generation) in pinning:
+        return  # Записи, пришедшие во время отправки, допишет правка после закрепления
+    pinning.add((chat_id, generation))
+    started = time.perf_counter()
+    future = outbound.submit(PRIORITY_ANNOUNCE, bot.send_message, chat_id, game.player_list.take_page(0),
+                             chat_id=chat_id, reply_markup=pinned_keyboard(game))
+    future.add_done_callback(lambda sent: pin_pinned_message(game, generation, started, sent))
+
+# Закрепление отправленного списка (колбэк отправки)
+def pin_pinned_message(game, generation, started, sent):
+    chat_id = game.chat_id
+    if sent.exception() is not None:
+        pinning.discard((chat_id, generation))
+        log_error("pin_failed", sent.exception(), chat_id=chat_id)
+        return
+    message_id = sent.result().message_id
+    future = outbound.submit(PRIORITY_ANNOUNCE, bot.pin_chat_message, chat_id, message_id, chat_id=chat_id)
+    future.add_done_callback(lambda pinned: record_pinned_message(game, generation, started, message_id, pinned))
+
+# Сохранение закреплённого списка (колбэк закрепления)
+def record_pinned_message(game, generation, started, message_id, pinned):
+    chat_id = game.chat_id
+    pinning.discard((chat_id, generation))
+    metrics.observe("pinned_update_seconds", time.perf_counter() - started)
+    if pinned.exception() is not None:
+        log_error("pin_failed", pinned.exception(), chat_id=chat_id)
+        return
+    if game.player_list.generation != generation:
+        return  # Игру сбросили, пока список отправлялся
+    game.pinned_message_id = message_id
+    journal.record(game, "pinned", message_id=message_id)
+    if game.player_list.dirty:
+        # Записи, пришедшие во время отправки
+        edit_scheduler.mark_dirty(chat_id)
+
+# Закрытие записи: по /spisok, по таймеру или по числу игроков
+def close_registration(game):
+    chat_id = game.chat_id
+    game.registration_open = False
+    journal.record(game, "close")
+    timers.cancel(chat_id, "close_registration")
+    game.player_list.mark_dirty(0)
+    announce(chat_id, f"⏹ Сбор игроков завершён!\n🎮 Игра {game.active_game.title()} начинается! Всем удачи! 🍀")
+    update_pinned_message(chat_id)  # Убираем кнопку "Записаться"
+
+# Автозакрытие записи, когда набралось REGISTRATION_MAX_PLAYERS записей
+def check_player_limit(game):
+    if REGISTRATION_MAX_PLAYERS and game.registration_open and len(game.players) >= REGISTRATION_MAX_PLAYERS:
+        close_registration(game)
+
+# Выдача рядов Бинго с записью в журнал; False — числа кончились
+def draw_and_announce(game, count):
+    rows, winners = draw_rows(game, count)
+    if not rows:
+        return False
+    for row in rows:
+        journal.record(game, "draw", row=row)
+    announce(game.chat_id, render_bingo_draw(game, rows))
+    if winners:
+        for text in render_bingo_winners(winners):
+            announce(game.chat_id, text)
+    return True
+
+# Таймеры новой игры: автозакрытие записи и сброс при простое
+def schedule_game_timers(chat_id):
+    if REGISTRATION_TIMEOUT:
+        timers.schedule(chat_id, "close_registration", REGISTRATION_TIMEOUT)
+        announce(chat_id, f"⏳ Запись закроется автоматически через {format_delay(REGISTRATION_TIMEOUT)}.")
+    if GAME_IDLE_TIMEOUT:
+        timers.schedule(chat_id, "idle_cleanup", GAME_IDLE_TIMEOUT)
+
+# "90 сек." или "5 мин."
+def format_delay(seconds):
+    if seconds >= 60 and seconds % 60 == 0:
+        return f"{seconds // 60} мин."
+    return f"{seconds} сек."
+
+# Значения, которые /metrics читает в момент запроса
+metrics.register("sessions", lambda: len(sessions))
+metrics.register("outbound_queued", lambda: outbound.stats()["queued"])
+metrics.register("pinned_edits_pending", lambda: edit_scheduler.stats()["pending"])
+metrics.register("timers_pending", lambda: timers.stats()["pending"])
+metrics.register("updates_filtered_total", lambda: router.stats()["filtered"], kind="counter")
+
+# Сводка метрик для /stats: квантили обработчиков, вызовы Telegram и SQLite
+def render_stats(filtered):
+    lines = ["📊 Статистика с момента запуска", "", "⏱ Обработчики (p50 / p95 / p99, мс):"]
+    handlers = metrics.summary("handler_seconds")
+    for labels, (count, quantiles) in sorted(handlers.items(), key=lambda item: -item[1][0]):
+        p50, p95, p99 = (round(q * 1000, 1) for q in quantiles)
+        lines.append(f"- {dict(labels)['handler']}: {count} шт., {p50} / {p95} / {p99}")
+    updates = sum(count for count, _ in handlers.values())
+    api_calls = metrics.counter_values("telegram_api_calls_total")
+    total_calls = sum(api_calls.values())
+    lines += ["", f"📨 Telegram API: {total_calls} вызовов, "
+                  f"{total_calls / updates if updates else 0:.2f} на обновление"]
+    for labels, (count, quantiles) in sorted(metrics.summary("telegram_api_seconds").items()):
+        lines.append(f"- {dict(labels)['method']}: {count} шт., p99 {round(quantiles[2] * 1000, 1)} мс")
+    for labels, (count, quantiles) in metrics.summary("callback_answer_seconds").items():
+        p50, p95, p99 = (round(q * 1000, 1) for q in quantiles)
+        lines += ["", f"👆 Ответ на кнопку от нажатия: {count} шт., {p50} / {p95} / {p99} мс"]
+    lines += ["", "💾 SQLite (p99, мс):"]
+    for labels, (count, quantiles) in sorted(metrics.summary("sqlite_seconds").items()):
+        lines.append(f"- {dict(labels)['op']}: {count} шт., {round(quantiles[2] * 1000, 2)}")
+    lines += ["", f"🚫 Отброшено обновлений без обработчика: {filtered}"]
+    flood = flood_guard.stats()
+    lines.append(f"🌊 Флуд: отброшено {flood['dropped_user']} по лимиту пользователя и {flood['dropped_chat']} "
+                 f"по лимиту чата, отказов без ответа (повторы и лимит чата): {flood['suppressed']}")
+    return "\n".join(lines)
+
+# Восстановление игры, прерванной перезапуском
+def restore_game(scheduler, owns=None):
+    started = time.perf_counter()
+    replayed = journal.restore(sessions, owns)
+    games = sessions.active()
+    if not games:
+        return
+    log_event("games_restored", games=len(games), records=replayed,
+              ms=round((time.perf_counter() - started) * 1000, 1))
+    for game in games:
+        log_event("game_restored", chat_id=game.chat_id, game=game.active_game,
+                  entries=len(game.players), rows=len(game.bingo_numbers))
+        if game.pinned_message_id:
+            scheduler.mark_dirty(game.chat_id)
+
+# Загрузка данных при старте бота (не при импорте модуля): схема, VIP и бонусы, рейтинг, update_id, игры.
+# owns(chat_id) — чаты воркера supervisor.py, по умолчанию все
+def start_up(scheduler, owns=None):
+    started = time.perf_counter()
+    version = storage.open()
+    storage.load(privileges)
+    leaderboard.load(history.user_rows(), privileges.vip_users)
+    update_tracker.load()
+    log_event("storage_loaded", schema=version, vip=len(privileges.vip_users),
+              last_update_id=update_tracker.last_update_id, ms=round((time.perf_counter() - started) * 1000, 1))
+    restore_game(scheduler, owns)
+
+# Перечитывание VIP, бонусов и рейтинга из базы, когда их изменил другой процесс
+def reload_shared():
+    storage.load(privileges)
+    leaderboard.load(history.user_rows(), privileges.vip_users)
+
+# Текст /help
+HELP_TEXT = (
+    "📖 Список команд бота:\n\n"
+    "🎮 /game — Запустить новую игру (Бинго или Рулетка).\n"
+    "📋 /spisok — Завершить сбор игроков и начать игру.\n"
+    "🔢 /num — Выдать 1 ряд из 5 случайных чисел (для Бинго).\n"
+    "🔢 /num2 — Выдать 2 ряда из 5 случайных чисел (для Бинго).\n"
+    "⏱ /autodraw <секунд> — Выдавать ряд автоматически с интервалом, /autodraw 0 — выключить (для Бинго).\n"
+    "🔗 /bingo — Сообщить, что у вас есть все числа (для Бинго).\n"
+    "🎰 /random <число> — Выбрать случайный номер (для Рулетки, например /random 30).\n"
+    "🏁 /stop — Завершить игру (Бинго или Рулетка). Бонусы сбрасываются.\n"
+    "🔄 /reset — Принудительно сбросить состояние игры.\n"
+    "📋 /getid — Показать ваш ID и ID чата.\n"
+    "👑 /vip — Назначить участника VIP (для админов).\n"
+    "👑 /delvip — Удалить участника из VIP (для админов).\n"
+    "🎁 /bonus — Дать бонус участнику (для админов).\n"
+    "🏆 /top — Рейтинг игроков по победам и играм и список VIP.\n"
+    "📖 /help — Показать это сообщение.\n"
+    "📊 /stats — Задержки обработчиков и вызовы Telegram (для админов).\n"
+    "📈 /userstats [@username] — Игры, записи и победы игрока по архиву (для админов).\n"
+    "🔢 /numstats — Числа, чаще всего выигрывавшие в Бинго (для админов).\n"
+    "🪵 /loglevel <уровень> — Показать или сменить уровень логов (для админов).\n"
+    "📥 /import — Записать список игроков: строки '@username 1 2 3 4 5' после команды или CSV-файл с подписью /import (для админов).\n"
+    "📤 /export — Выгрузить список игроков в CSV (для админов).\n\n"
+    "❗ Примечания:\n"
+    "- Для участия в Бинге отправьте @ и 5 чисел (или 4 для VIP/бонуса) (например, @ 1 2 3 4 5).\n"
+    "- Для участия в Рулетке отправьте @ или нажмите кнопку 'Записаться' в закреплённом сообщении.\n"
+    "- Команды /game, /spisok, /num, /num2, /autodraw, /random, /stop, /reset, /vip, /delvip, /bonus, /stats, /userstats, /numstats, /loglevel, /import, /export доступны только админу."
+)
+
+# Команда /game
+@router.command("game")
+def start_game(message):
+    user_id = message.from_user.id
+    chat_id = message.chat.id
+    if not is_admin(user_id):
+        reply_error(message, "❌ Только админ может запускать игру!")
+        return
+    if not is_valid_chat(chat_id):
+        reply_error(message, "❌ Этот бот работает только в указанном чате!")
+        return
+    if sessions.get(chat_id).active_game:
+        reply_error(message, "⚠ Игра уже запущена! Завершите с /stop или используйте /reset.")
+        return
+    reply(message, "🎮 Выберите игру:", reply_markup=game_selection_keyboard())
+
+# Обработка кнопки "Записаться"
+@router.callback("register")
+def handle_register_button(call):
+    user_id = call.from_user.id
+    chat_id = call.message.chat.id
+    if not is_valid_chat(chat_id):
+        answer_callback(call, "❌ Этот бот работает только в указанном чате!")
+        return
+    if not flood_guard.allow(chat_id, user_id):
+        answer_callback(call, "⏳ Не так быстро! Попробуйте ещё раз через пару секунд.")
+        return
+    with chat_locks[chat_id]:
+        game = sessions.get(chat_id)
+        if game.active_game != "roulette" or not game.registration_open:
+            answer_rejection(call, "❌ Регистрация на рулетку не открыта!")
+            return
+
+        claim_imported(game, call.from_user)
+        username = display_name(call.from_user)
+        current_entries = count_entries(game, user_id)
+        max_entries = max_entries_for(chat_id, user_id)
+        if current_entries >= max_entries:
+            answer_rejection(call, f"❌ Вы уже записаны максимальное количество раз ({max_entries})!")
+            return
+
+        game.add_player(user_id, username)
+        flood_guard.forget(user_id)
+        answer_callback(call, "✅ Вы записаны!")
+        journal.record(game, "register", user_id=user_id, username=username)
+        update_pinned_message(chat_id)
+        check_player_limit(game)
+
+# Обработка выбора игры (только для админов)
+@router.callback("bingo", "roulette")
+def handle_game_selection(call):
+    user_id = call.from_user.id
+    chat_id = call.message.chat.id
+
+    if not is_admin(user_id):
+        answer_callback(call, "❌ Только админ может выбирать игру!")
+        return
+
+    if not is_valid_chat(chat_id):
+        answer_callback(call, "❌ Этот бот работает только в указанном чате!")
+        return
+
+    answer_callback(call)
+    with chat_locks[chat_id]:
+        game = sessions.get(chat_id)
+        game.start(call.data)
+        journal.record(game, "start", game=call.data, seed=game.deck.seed, started_at=game.started_at)
+        log_event("game_started", chat_id=chat_id, game=call.data, seed=game.deck.seed)
+        timers.cancel(chat_id)
+
+        if call.data == "bingo":
+            announce(chat_id,
+                     "🎲 Запись на Бинго открыта!\n📝 Для участия отправьте @ и 5 чисел от 1 до 100 (или 4 для VIP/бонус)\nПример: @ 1 2 3 4 5\n\n📋 Список игроков:")
+            update_pinned_message(chat_id)
+        elif call.data == "roulette":
+            announce(chat_id,
+                     "🎰 Запись на Рулетку открыта!\n📝 Для участия отправьте @\n\n📋 Список игроков:")
+            update_pinned_message(chat_id)
+
+        schedule_game_timers(chat_id)
+
+# Регистрация игроков
+@router.prefix("@", game_only=True)
+def register_player(message):
+    chat_id = message.chat.id
+    user_id = message.from_user.id
+    username = display_name(message.from_user)
+    if not is_valid_chat(chat_id):
+        return
+    if not flood_guard.allow(chat_id, user_id):
+        return
+    with chat_locks[chat_id]:
+        game = sessions.get(chat_id)
+        if not game.registration_open:
+            return
+
+        claim_imported(game, message.from_user)
+        current_entries = count_entries(game, user_id)
+        max_entries = max_entries_for(chat_id, user_id)
+
+        if current_entries >= max_entries:
+            reply_rejection(message, f"❌ Вы уже записаны максимальное количество раз ({max_entries})!")
+            return
+
+        if game.active_game == "bingo":
+            username_to_save, numbers, error = parse_bingo_entry(message.text, chat_id, user_id, username)
+            if error:
+                reply_rejection(message, error)
+                return
+
+            game.add_player(user_id, username_to_save, numbers)
+            flood_guard.forget(user_id)
+            journal.record(game, "register", user_id=user_id, username=username_to_save, numbers=numbers)
+            update_pinned_message(chat_id)
+            check_player_limit(game)
+
+        elif game.active_game == "roulette":
+            if message.text.strip() != "@":
+                return
+
+            game.add_player(user_id, username)
+            flood_guard.forget(user_id)
+            journal.record(game, "register", user_id=user_id, username=username)
+            update_pinned_message(chat_id)
+            check_player_limit(game)
+
+# Команда /spisok
+@router.command("spisok")
+def stop_registration(message):
+    user_id = message.from_user.id
+    chat_id = message.chat.id
+    if not is_admin(user_id):
+        reply_error(message, "❌ Только админ может завершать сбор!")
+        return
+    if not is_valid_chat(chat_id):
+        return
+    with chat_locks[chat_id]:
+        game = sessions.get(chat_id)
+        if not game.registration_open:
+            reply_error(message, "⚠ Сбор игроков уже завершён или не начат!")
+            return
+        close_registration(game)
+
+# Команды /num и /num2
+@router.command("num", "num2")
+def generate_bingo_numbers(message):
+    user_id = message.from_user.id
+    chat_id = message.chat.id
+    if not is_admin(user_id):
+        reply_error(message, "❌ Только админ может генерировать числа!")
+        return
+    if not is_valid_chat(chat_id):
+        return
+    with chat_locks[chat_id]:
+        game = sessions.get(chat_id)
+        if game.active_game != "bingo" or game.registration_open:
+            reply_error(message, "⚠ Игра Бинго не активна или сбор не завершён!")
+            return
+        count = 1 if message.text.split()[0].split("@")[0] == "/num" else 2
+        if not draw_and_announce(game, count):
+            reply_error(message, "⚠ Все числа уже выпали! Завершите игру с /stop.")
+
+# Проверка слова "Бинго"
+@router.keyword("bingo", "бинго", game_only=True)
+def check_bingo(message):
+    chat_id = message.chat.id
+    user_id = message.from_user.id
+    username = display_name(message.from_user)
+    if not is_valid_chat(chat_id):
+        return
+    if not flood_guard.allow(chat_id, user_id):
+        return
+    with chat_locks[chat_id]:
+        game = sessions.get(chat_id)
+        if game.active_game != "bingo" or game.registration_open:
+            return
+
+        claim_imported(game, message.from_user)
+        if not game.entries_of(user_id):
+            reply_rejection(message, "❌ Вы не участвуете в игре!")
+            return
+
+        if game.has_bingo(user_id):
+            announce(chat_id,
+                     f"✅ {username} заявил Бинго! Числа совпадают! Админ, проверьте остальные условия. 🎉")
+            return
+
+        text = f"❌ {username}, не обманывайте! Не все ваши числа есть в списке. Админ, продолжайте игру! 😡"
+        if flood_guard.first_rejection(chat_id, user_id, text):
+            announce(chat_id, text)
+
+# Команда /random
+@router.command("random")
+def random_roulette(message):
+    user_id = message.from_user.id
+    chat_id = message.chat.id
+    if not is_admin(user_id):
+        reply_error(message, "❌ Только админ может запускать рандом!")
+        return
+    if not is_valid_chat(chat_id):
+        reply_error(message, "❌ Этот бот работает только в указанном чате!")
+        return
+    with chat_locks[chat_id]:
+        game = sessions.get(chat_id)
+        if game.active_game != "roulette" or game.registration_open:
+            reply_error(message, "⚠ Игра Рулетка не активна или сбор не завершён!")
+            return
+        try:
+            count = int(message.text.split()[1])
+            if count != len(game.players):
+                reply_error(message, f"❌ Указано неверное количество игроков! В списке: {len(game.players)}")
+                return
+        except (IndexError, ValueError):
+            reply_error(message, "❌ Укажите число игроков, например /random 30")
+            return
+        random_index = random.randint(1, count)
+        announce(chat_id, f"🎰 Рандом: {random_index}\n⏳ Ждём {format_delay(ROULETTE_COUNTDOWN)}..")
+        timers.schedule(chat_id, "roulette_result", ROULETTE_COUNTDOWN, number=random_index)
+
+# Команда /stop
+@router.command("stop")
+def stop_game(message):
+    user_id = message.from_user.id
+    chat_id = message.chat.id
+    if not is_admin(user_id):
+        reply_error(message, "❌ Только админ может завершить игру!")
+        return
+    if not is_valid_chat(chat_id):
+        reply_error(message, "❌ Этот бот работает только в указанном чате!")
+        return
+    with chat_locks[chat_id]:
+        game = sessions.get(chat_id)
+        if not game.active_game:
+            reply_error(message, "⚠ Игра не запущена!")
+            return
+        totals = history.archive(game)
+        if totals is None:
+            # Игра и журнал остаются как есть: /stop можно повторить, ничего не потеряв
+            reply_error(message, "❌ Не удалось сохранить игру в архив! Попробуйте /stop ещё раз.")
+            return
+        leaderboard.record_game(totals)
+        announce(chat_id, f"🏁 Игра {game.active_game.title()} завершена! Всем спасибо за участие! 🎉")
+        game.reset()
+        journal.record(game, "reset")
+        timers.cancel(chat_id)
+        # Бонусы были на эту игру: снимаем только их, у других чатов свои игры
+        privileges.clear_bonuses(chat_id)
+        storage.clear_bonuses(chat_id)
+
+# Команда /reset
+@router.command("reset")
+def reset_game(message):
+    user_id = message.from_user.id
+    chat_id = message.chat.id
+    if not is_admin(user_id):
+        reply_error(message, "❌ Только админ может сбросить игру!")
+        return
+    if not is_valid_chat(chat_id):
+        reply_error(message, "❌ Этот бот работает только в указанном чате!")
+        return
+    with chat_locks[chat_id]:
+        announce(chat_id, "🔄 Состояние игры сброшено! Теперь можно начать новую игру с /game.")
+        game = sessions.get(chat_id)
+        game.reset()
+        journal.record(game, "reset")
+        timers.cancel(chat_id)
+
+# Команда /getid
+@router.command("getid")
+def get_id(message):
+    user_id = message.from_user.id
+    chat_id = message.chat.id
+    username = display_name(message.from_user)
+    reply(message, f"📋 Информация:\n"
+                   f"- Ваш ID: {user_id}\n"
+                   f"- ID чата: {chat_id}\n"
+                   f"- Ваше имя: {username}")
+
+# Команда /vip
+@router.command("vip")
+def set_vip(message):
+    user_id = message.from_user.id
+    chat_id = message.chat.id
+    if not is_admin(user_id):
+        reply_error(message, "❌ Только админ может назначать VIP!")
+        return
+    if not is_valid_chat(chat_id):
+        reply_error(message, "❌ Этот бот работает только в указанном чате!")
+        return
+    if not message.reply_to_message:
+        reply_error(message, "❌ Ответьте на сообщение пользователя, которого хотите сделать VIP!")
+        return
+
+    target_user_id = message.reply_to_message.from_user.id
+    target_username = display_name(message.reply_to_message.from_user)
+    if not privileges.add_vip(target_user_id, target_username):
+        reply_error(message, f"❌ {target_username} уже является VIP!")
+        return
+
+    storage.save_vip(target_user_id, target_username)
+    leaderboard.set_vip(target_user_id, target_username, True)
+    reply(message, f"👑 {target_username} получил статус VIP!")
+
+# Команда /delvip
+@router.command("delvip")
+def remove_vip(message):
+    user_id = message.from_user.id
+    chat_id = message.chat.id
+    if not is_admin(user_id):
+        reply_error(message, "❌ Только админ может удалять VIP!")
+        return
+    if not is_valid_chat(chat_id):
+        reply_error(message, "❌ Этот бот работает только в указанном чате!")
+        return
+    if not message.reply_to_message:
+        reply_error(message, "❌ Ответьте на сообщение пользователя, которого хотите удалить из VIP!")
+        return
+
+    target_user_id = message.reply_to_message.from_user.id
+    target_username = display_name(message.reply_to_message.from_user)
+    if not privileges.remove_vip(target_user_id):
+        reply_error(message, f"❌ {target_username} не является VIP!")
+        return
+
+    storage.delete_vip(target_user_id)
+    leaderboard.set_vip(target_user_id, target_username, False)
+    reply(message, f"✅ {target_username} больше не VIP.")
+
+# Команда /bonus
+@router.command("bonus")
+def set_bonus(message):
+    user_id = message.from_user.id
+    chat_id = message.chat.id
+    if not is_admin(user_id):
+        reply_error(message, "❌ Только админ может выдавать бонусы!")
+        return
+    if not is_valid_chat(chat_id):
+        reply_error(message, "❌ Этот бот работает только в указанном чате!")
+        return
+    if not message.reply_to_message:
+        reply_error(message, "❌ Ответьте на сообщение пользователя, которому хотите дать бонус!")
+        return
+
+    target_user_id = message.reply_to_message.from_user.id
+    target_username = display_name(message.reply_to_message.from_user)
+    if is_vip(target_user_id):
+        reply_error(message, f"❌ {target_username} является VIP и уже имеет эти привилегии!")
+        return
+    with chat_locks[chat_id]:
+        if privileges.bonus(chat_id, target_user_id):
+            reply_error(message, f"❌ {target_username} уже получил бонус в этой игре!")
+            return
+        privileges.add_bonus(chat_id, target_user_id, 1)
+        storage.save_bonus(chat_id, target_user_id, 1)
+    reply(message, f"🎁 {target_username} получил бонус на эту игру! Может быть записан на бинго с 4 цифрами и на рулетку 2 раза.")
+
+# Команда /top
+@router.command("top")
+def show_top(message):
+    chat_id = message.chat.id
+    if not is_valid_chat(chat_id):
+        reply_error(message, "❌ Этот бот работает только в указанном чате!")
+        return
+
+    send(chat_id, leaderboard.render(), fold_key=(chat_id, "top"))
+
+# Команда /help
+@router.command("help")
+def help_command(message):
+    chat_id = message.chat.id
+    send(chat_id, HELP_TEXT)
+
+# Команда /stats: задержки обработчиков и вызовы Telegram (для админов)
+@router.command("stats")
+def stats_command(message):
+    if not is_admin(message.from_user.id):
+        reply_error(message, "❌ Только админ может смотреть статистику!")
+        return
+    reply(message, render_stats(router.stats()["filtered"]))
+
+# Команда /userstats: участие и победы игрока по архиву игр (для админов)
+@router.command("userstats")
+def user_stats_command(message):
+    if not is_admin(message.from_user.id):
+        reply_error(message, "❌ Только админ может смотреть статистику игроков!")
+        return
+    target = stats_target(message)
+    reply(message, render_user_stats(target, history.user_stats(target)))
+
+# Команда /numstats: самые «выигрышные» числа Бинго по архиву (для админов)
+@router.command("numstats")
+def number_stats_command(message):
+    if not is_admin(message.from_user.id):
+        reply_error(message, "❌ Только админ может смотреть статистику чисел!")
+        return
+    reply(message, render_top_numbers(history.top_numbers(), history.games_count()))
+
+# Команда /loglevel: показать или сменить уровень логов без перезапуска
+@router.command("loglevel")
+def log_level_command(message):
+    if not is_admin(message.from_user.id):
+        reply_error(message, "❌ Только админ может менять уровень логов!")
+        return
+    parts = message.text.split()
+    if len(parts) < 2:
+        reply(message, f"🪵 Уровень логов: {get_level()}")
+        return
+    if not set_level(parts[1]):
+        reply_error(message, "❌ Уровни: DEBUG, INFO, WARNING, ERROR")
+        return
+    log_event("log_level_changed", logging.WARNING, user_id=message.from_user.id, level=get_level())
+    reply(message, f"🪵 Уровень логов: {get_level()}")
+
+# Проверки перед /import: админ, наш чат и открытая запись
+def import_allowed(message):
+    if not is_admin(message.from_user.id):
+        reply_error(message, "❌ Только админ может импортировать игроков!")
+        return False
+    if not is_valid_chat(message.chat.id):
+        return False
+    if not sessions.get(message.chat.id).registration_open:
+        reply_error(message, "⚠ Запись игроков не открыта!")
+        return False
+    return True
+
+# Массовая запись: всё проверяется сразу, применяется целиком одной записью журнала
+def import_entries(message, text):
+    chat_id = message.chat.id
+    with chat_locks[chat_id]:
+        game = sessions.get(chat_id)
+        # Пока скачивался файл, запись могла закрыться по таймеру
+        if not game.registration_open:
+            reply_error(message, "⚠ Запись игроков не открыта!")
+            return
+        entries, errors = parse_bulk(text, game, privileges)
+        if errors:
+            reply_error(message, render_errors(errors))
+            return
+        if not entries:
+            reply_error(message, "⚠ Нет ни одной записи. Формат строки: @username 1 2 3 4 5")
+            return
+        apply_bulk(game, entries)
+        journal.record(game, "bulk_register", entries=[list(entry) for entry in entries])
+        log_event("bulk_registered", chat_id=chat_id, user_id=message.from_user.id, entries=len(entries))
+        update_pinned_message(chat_id)
+        reply(message, f"✅ Записано игроков: {len(entries)}")
+        check_player_limit(game)
+
+# Команда /import со списком в следующих строках сообщения
+@router.command("import")
+def import_command(message):
+    if not import_allowed(message):
+        return
+    import_entries(message, message.text.partition("\n")[2])
+
+# Сообщение с файлом и подписью /import (фильтр обработчика документов)
+def is_import_document(message):
+    return (message.caption or "").startswith("/import")
+
+# Файл с подписью /import (CSV или текст, UTF-8)
+def import_document(message):
+    if not import_allowed(message):
+        return
+    if message.document.file_size and message.document.file_size > IMPORT_MAX_BYTES:
+        reply_error(message, f"❌ Файл больше {IMPORT_MAX_BYTES // 1000} КБ!")
+        return
+    try:
+        file_info = outbound.call(PRIORITY_REPLY, bot.get_file, message.document.file_id)
+        data = outbound.call(PRIORITY_REPLY, bot.download_file, file_info.file_path)
+        text = data.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        reply_error(message, "❌ Файл должен быть в кодировке UTF-8!")
+        return
+    except Exception as e:
+        log_error("import_download_failed", e, chat_id=message.chat.id)
+        reply_error(message, "❌ Не удалось скачать файл!")
+        return
+    import_entries(message, text)
+
+# Команда /export: список игроков файлом CSV
+@router.command("export")
+def export_command(message):
+    chat_id = message.chat.id
+    if not is_admin(message.from_user.id):
+        reply_error(message, "❌ Только админ может выгружать список!")
+        return
+    if not is_valid_chat(chat_id):
+        reply_error(message, "❌ Этот бот работает только в указанном чате!")
+        return
+    with chat_locks[chat_id]:
+        game = sessions.get(chat_id)
+        if not game.players:
+            reply_error(message, "⚠ Список игроков пуст!")
+            return
+        outbound.submit(PRIORITY_REPLY, bot.send_document, chat_id, export_csv(game), chat_id=chat_id)
+
+# Команда /autodraw <секунд>: выдавать ряд Бинго по таймеру, /autodraw 0 — остановить
+@router.command("autodraw")
+def auto_draw_command(message):
+    chat_id = message.chat.id
+    if not is_admin(message.from_user.id):
+        reply_error(message, "❌ Только админ может включать автовыдачу!")
+        return
+    if not is_valid_chat(chat_id):
+        return
+    with chat_locks[chat_id]:
+        game = sessions.get(chat_id)
+        if game.active_game != "bingo" or game.registration_open:
+            reply_error(message, "⚠ Игра Бинго не активна или сбор не завершён!")
+            return
+        try:
+            interval = int(message.text.split()[1])
+        except (IndexError, ValueError):
+            reply_error(message, "❌ Укажите интервал в секундах, например /autodraw 60 (0 — выключить)")
+            return
+        if interval <= 0:
+            timers.cancel(chat_id, "auto_draw")
+            reply(message, "⏹ Автовыдача рядов выключена.")
+            return
+        timers.schedule(chat_id, "auto_draw", interval, interval=interval)
+        reply(message, f"⏱ Ряд будет выдаваться каждые {format_delay(interval)}")
+
+# Таймер: запись закрывается сама
+@timers.handler("close_registration")
+def close_registration_timer(chat_id, payload):
+    with chat_locks[chat_id]:
+        game = sessions.find(chat_id)
+        if game is not None and game.registration_open:
+            close_registration(game)
+
+# Таймер: очередной ряд Бинго и следующий таймер
+@timers.handler("auto_draw")
+def auto_draw_timer(chat_id, payload):
+    with chat_locks[chat_id]:
+        game = sessions.find(chat_id)
+        if game is None or game.active_game != "bingo" or game.registration_open:
+            return
+        if not draw_and_announce(game, 1):
+            announce(chat_id, "⚠ Все числа уже выпали! Автовыдача остановлена.")
+            return
+        timers.schedule(chat_id, "auto_draw", payload["interval"], **payload)
+
+# Таймер: итог рулетки после обратного отсчёта /random
+@timers.handler("roulette_result")
+def roulette_result_timer(chat_id, payload):
+    with chat_locks[chat_id]:
+        game = sessions.find(chat_id)
+        if game is None or game.active_game != "roulette":
+            return
+        number = payload["number"]
+        if number > len(game.players):
+            return
+        announce(chat_id, f"⏰ Время вышло! Номер {number}: {game.players[number - 1].username} 🎉")
+
+# Таймер: сброс игры, в чате которой давно ничего не происходило
+@timers.handler("idle_cleanup")
+def idle_cleanup_timer(chat_id, payload):
+    with chat_locks[chat_id]:
+        game = sessions.find(chat_id)
+        if game is None or not game.active_game:
+            return
+        idle = time.monotonic() - game.last_activity
+        if idle < GAME_IDLE_TIMEOUT:
+            timers.schedule(chat_id, "idle_cleanup", GAME_IDLE_TIMEOUT - idle)
+            return
+        log_event("game_idle_reset", chat_id=chat_id, game=game.active_game, idle=round(idle))
+        announce(chat_id, "💤 Игра сброшена из-за долгого простоя. Начните новую с /game.")
+        game.reset()
+        journal.record(game, "reset")
+        timers.cancel(chat_id)
+
+# Завершение уже выполнено: shut_down() вызывают и atexit из main.py, и режимы запуска
+is_shut_down = False
+
+# Сохранение данных перед завершением: сначала таймеры и фоновые очереди, затем update_id и база.
+# Повторный вызов ничего не делает
+def shut_down():
+    global is_shut_down
+    if is_shut_down:
+        return
+    is_shut_down = True
+    timers.stop()
+    edit_scheduler.stop()
+    outbound.stop()
+    update_tracker.flush()
+    storage.close()
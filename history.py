@@ -0,0 +1,122 @@
+import time
+from bingo import SEED_BITS
+from game_state import UNKNOWN_USER_ID
+from logs import log_error
+from metrics import metrics
+
+
+class GameHistory:
+    """Архив завершённых игр и готовые агрегаты для статистики.
+
+    archive() пишет игру одной транзакцией: строку в games, записи игроков
+    в game_entries, выпавшие ряды в game_draws и сразу обновляет агрегаты
+    user_stats (игры, записи, победы по user_id) и number_stats (сколько раз
+    число выпадало и сколько раз было в выигравшей карточке). Поэтому
+    user_stats()/top_numbers() — чтение одной строки или короткого индекса,
+    их время не зависит от числа игр в архиве. Запись идёт через подключение
+    Storage, чтение статистики — через Storage.reader() и запись не ждёт.
+    """
+
+    def __init__(self, storage):
+        self.storage = storage
+
+    def archive(self, game_state, finished_at=None):
+        """Сохраняет завершённую игру и обновляет агрегаты.
+
+        Возвращает итоги игроков {user_id: (username, записей, победа)} для
+        рейтинга или None, если записать не удалось.
+        """
+        finished_at = finished_at or time.time()
+        entries, users, numbers = collect_game(game_state)
+        draws = [(seq, " ".join(map(str, row))) for seq, row in enumerate(game_state.bingo_numbers)]
+        try:
+            with metrics.timer("sqlite_seconds", op="history_archive"), self.storage.lock, self.storage.conn:
+                conn = self.storage.conn
+                game_id = conn.execute(
+                    "INSERT INTO games (chat_id, game_type, seed, started_at, finished_at, entries, draws) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (game_state.chat_id, game_state.active_game, stored_seed(game_state.deck.seed),
+                     game_state.started_at, finished_at, len(entries), len(draws))).lastrowid
+                conn.executemany(
+                    "INSERT INTO game_entries (game_id, position, user_id, username, numbers, won) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    [(game_id,) + entry for entry in entries])
+                conn.executemany("INSERT INTO game_draws (game_id, seq, numbers) VALUES (?, ?, ?)",
+                                 [(game_id,) + draw for draw in draws])
+                conn.executemany(
+                    "INSERT INTO user_stats (user_id, username, username_key, games, entries, wins, last_game_at) "
+                    "VALUES (?, ?, ?, 1, ?, ?, ?) "
+                    "ON CONFLICT(user_id) DO UPDATE SET username = excluded.username, "
+                    "username_key = excluded.username_key, games = games + 1, "
+                    "entries = entries + excluded.entries, wins = wins + excluded.wins, "
+                    "last_game_at = excluded.last_game_at",
+                    [(user_id, username, username.lower(), count, won, finished_at)
+                     for user_id, (username, count, won) in users.items()])
+                conn.executemany(
+                    "INSERT INTO number_stats (number, drawn, winning) VALUES (?, ?, ?) "
+                    "ON CONFLICT(number) DO UPDATE SET drawn = drawn + excluded.drawn, "
+                    "winning = winning + excluded.winning",
+                    [(number, drawn, winning) for number, (drawn, winning) in numbers.items()])
+        except Exception as e:
+            log_error("history_archive_failed", e, chat_id=game_state.chat_id)
+            return None
+        self.storage.shared_changed()
+        return users
+
+    def user_stats(self, user):
+        """Статистика игрока по user_id или @username: (username, игры, записи, победы) или None."""
+        with metrics.timer("sqlite_seconds", op="history_user_stats"), self.storage.reader() as conn:
+            if isinstance(user, int):
+                return conn.execute(
+                    "SELECT username, games, entries, wins FROM user_stats WHERE user_id = ?", (user,)).fetchone()
+            return conn.execute(
+                "SELECT username, games, entries, wins FROM user_stats WHERE username_key = ? "
+                "ORDER BY last_game_at DESC LIMIT 1", (user.lower(),)).fetchone()
+
+    def user_rows(self):
+        """Все строки user_stats для рейтинга: (user_id, username, игры, победы)."""
+        with metrics.timer("sqlite_seconds", op="history_user_rows"), self.storage.reader() as conn:
+            return conn.execute("SELECT user_id, username, games, wins FROM user_stats").fetchall()
+
+    def top_numbers(self, limit=10):
+        """Числа, чаще всего входившие в выигравшие карточки: [(число, выпадало, в победах)]."""
+        with metrics.timer("sqlite_seconds", op="history_top_numbers"), self.storage.reader() as conn:
+            return conn.execute(
+                "SELECT number, drawn, winning FROM number_stats ORDER BY winning DESC, drawn DESC LIMIT ?",
+                (limit,)).fetchall()
+
+    def games_count(self):
+        with metrics.timer("sqlite_seconds", op="history_games_count"), self.storage.reader() as conn:
+            return conn.execute("SELECT COUNT(*) FROM games").fetchone()[0]
+
+
+def stored_seed(seed):
+    """seed для столбца INTEGER: 64-битные seed из журналов старых версий — в дополнительном коде."""
+    if seed is not None and seed >= 1 << SEED_BITS:
+        return seed - (1 << 64)
+    return seed
+
+
+def collect_game(game_state):
+    """Строки архива из игры: (записи, {user_id: (имя, записей, победа)}, {число: (выпало, в победах)})."""
+    bingo = game_state.bingo
+    entries = []
+    users = {}
+    numbers = {}
+    for position, entry in enumerate(game_state.players):
+        card_numbers = entry.packed
+        won = card_numbers is not None and bingo.is_complete(entry.card_id)
+        entries.append((position, entry.user_id, entry.username,
+                        " ".join(map(str, card_numbers)) if card_numbers is not None else None, int(won)))
+        if entry.user_id != UNKNOWN_USER_ID:
+            _, count, user_won = users.get(entry.user_id, (None, 0, 0))
+            users[entry.user_id] = (entry.username, count + 1, max(user_won, int(won)))
+        if won:
+            for number in card_numbers:
+                drawn, winning = numbers.get(number, (0, 0))
+                numbers[number] = (drawn, winning + 1)
+    for row in game_state.bingo_numbers:
+        for number in row:
+            drawn, winning = numbers.get(number, (0, 0))
+            numbers[number] = (drawn + 1, winning)
+    return entries, users, numbers
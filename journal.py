@@ -0,0 +1,135 @@
+import json
+from logs import log_error
+from metrics import metrics
+
+
+class GameJournal:
+    """Журнал изменений игр по чатам для восстановления после падения.
+
+    Каждое изменение (start, pinned, page, register, bulk_register, draw, close) дописывается
+    строкой в game_journal с chat_id игры. Каждые snapshot_every записей чата
+    его состояние целиком сохраняется в game_snapshot, а журнал чата до него
+    удаляется; reset удаляет и снимок, и журнал чата. При старте restore()
+    читает снимки и проигрывает хвост журнала в реестр сессий.
+    Строка журнала — (seq, chat_id, op, payload в JSON), снимок — состояние
+    игры из dump_state() и seq последней вошедшей в него записи; в памяти
+    хранится только число записей каждого чата после его снимка.
+    """
+
+    def __init__(self, storage, snapshot_every=1000):
+        self.storage = storage
+        self.snapshot_every = snapshot_every
+        self.records_since_snapshot = {}  # {chat_id: записей после снимка}
+
+    def record(self, game_state, op, **payload):
+        """Дописывает изменение игры в журнал; при необходимости делает снимок."""
+        chat_id = game_state.chat_id
+        if op == "reset":
+            self.forget(chat_id)
+            return
+        try:
+            with metrics.timer("sqlite_seconds", op="journal_record"), self.storage.lock, self.storage.conn:
+                self.storage.conn.execute("INSERT INTO game_journal (chat_id, op, payload) VALUES (?, ?, ?)",
+                                          (chat_id, op, json.dumps(payload, ensure_ascii=False)))
+        except Exception as e:
+            log_error("journal_write_failed", e, chat_id=chat_id, op=op)
+            return
+        count = self.records_since_snapshot.get(chat_id, 0) + 1
+        self.records_since_snapshot[chat_id] = count
+        if count >= self.snapshot_every:
+            self.snapshot(game_state)
+
+    def snapshot(self, game_state):
+        """Сохраняет состояние игры целиком и удаляет записи журнала чата до него."""
+        chat_id = game_state.chat_id
+        data = json.dumps(dump_state(game_state), ensure_ascii=False)
+        try:
+            with metrics.timer("sqlite_seconds", op="journal_snapshot"), self.storage.lock, self.storage.conn:
+                row = self.storage.conn.execute(
+                    "SELECT COALESCE(MAX(seq), 0) FROM game_journal WHERE chat_id = ?", (chat_id,)).fetchone()
+                self.storage.conn.execute("INSERT OR REPLACE INTO game_snapshot (chat_id, seq, data) VALUES (?, ?, ?)",
+                                          (chat_id, row[0], data))
+                self.storage.conn.execute("DELETE FROM game_journal WHERE chat_id = ? AND seq <= ?", (chat_id, row[0]))
+        except Exception as e:
+            log_error("journal_snapshot_failed", e, chat_id=chat_id)
+            return
+        self.records_since_snapshot[chat_id] = 0
+
+    def forget(self, chat_id):
+        """Удаляет снимок и журнал чата после окончания игры."""
+        try:
+            with metrics.timer("sqlite_seconds", op="journal_forget"), self.storage.lock, self.storage.conn:
+                self.storage.conn.execute("DELETE FROM game_snapshot WHERE chat_id = ?", (chat_id,))
+                self.storage.conn.execute("DELETE FROM game_journal WHERE chat_id = ?", (chat_id,))
+        except Exception as e:
+            log_error("journal_forget_failed", e, chat_id=chat_id)
+            return
+        self.records_since_snapshot.pop(chat_id, None)
+
+    def restore(self, sessions, owns=None):
+        """Восстанавливает игры в реестр сессий; возвращает число записей журнала.
+
+        owns(chat_id) отбирает чаты, которые обслуживает этот процесс (воркер supervisor.py).
+        """
+        with metrics.timer("sqlite_seconds", op="journal_restore"), self.storage.lock:
+            snapshots = self.storage.conn.execute("SELECT chat_id, seq, data FROM game_snapshot").fetchall()
+            rows = self.storage.conn.execute(
+                "SELECT j.chat_id, j.op, j.payload FROM game_journal j "
+                "LEFT JOIN game_snapshot s ON s.chat_id = j.chat_id "
+                "WHERE j.seq > COALESCE(s.seq, 0) ORDER BY j.seq").fetchall()
+        if owns is not None:
+            snapshots = [row for row in snapshots if owns(row[0])]
+            rows = [row for row in rows if owns(row[0])]
+        for chat_id, seq, data in snapshots:
+            load_state(sessions.get(chat_id), json.loads(data))
+        for chat_id, op, payload in rows:
+            apply_record(sessions.get(chat_id), op, json.loads(payload))
+            self.records_since_snapshot[chat_id] = self.records_since_snapshot.get(chat_id, 0) + 1
+        return len(rows)
+
+
+def dump_state(game_state):
+    return {
+        "active_game": game_state.active_game,
+        "registration_open": game_state.registration_open,
+        "seed": game_state.deck.seed,
+        "started_at": game_state.started_at,
+        "pinned_message_id": game_state.pinned_message_id,
+        "page_message_ids": game_state.page_message_ids,
+        "players": [[entry.user_id, entry.username, entry.numbers] for entry in game_state.players],
+        "bingo_numbers": game_state.bingo_numbers,
+    }
+
+
+def load_state(game_state, data):
+    game_state.reset()
+    game_state.active_game = data["active_game"]
+    game_state.registration_open = data["registration_open"]
+    game_state.deck.shuffle(data.get("seed"))
+    game_state.started_at = data.get("started_at")
+    game_state.pinned_message_id = data["pinned_message_id"]
+    for user_id, username, numbers in data["players"]:
+        game_state.add_player(user_id, username, numbers)
+    game_state.page_message_ids = list(data.get("page_message_ids", []))
+    for row in data["bingo_numbers"]:
+        game_state.add_bingo_row(row)
+
+
+def apply_record(game_state, op, payload):
+    if op == "start":
+        game_state.start(payload["game"], payload.get("seed"), payload.get("started_at"))
+    elif op == "pinned":
+        game_state.pinned_message_id = payload["message_id"]
+    elif op == "page":
+        game_state.page_message_ids.append(payload["message_id"])
+    elif op == "register":
+        game_state.add_player(payload["user_id"], payload["username"], payload.get("numbers"))
+    elif op == "bulk_register":
+        for user_id, username, numbers in payload["entries"]:
+            game_state.add_player(user_id, username, numbers)
+    elif op == "claim":
+        game_state.claim_imported(payload["user_id"], payload["username"])
+    elif op == "draw":
+        game_state.add_bingo_row(payload["row"])
+    elif op == "close":
+        game_state.registration_open = False
@@ -0,0 +1,80 @@
+import bisect
+import threading
+
+TOP_SIZE = 10  # Сколько игроков показывать в /top
+
+
+class Leaderboard:
+    """Рейтинг игроков для /top, который живёт в памяти и обновляется по событиям.
+
+    players — {user_id: [username, игры, победы]}, ranking — отсортированный
+    список ключей (-победы, -игры, user_id). Конец игры (record_game) и смена
+    VIP (set_vip) переставляют только затронутых игроков через bisect и
+    сбрасывают готовый текст; render() строит текст один раз до следующего
+    изменения, поэтому повторные /top не считают ничего и не читают SQLite.
+    """
+
+    def __init__(self, top_size=TOP_SIZE):
+        self.top_size = top_size
+        self.players = {}
+        self.ranking = []
+        self.vip_users = {}  # {user_id: username}
+        self.text = None
+        self.lock = threading.Lock()
+
+    def load(self, rows, vip_users):
+        """Заполняет рейтинг из архива: rows — (user_id, username, игры, победы)."""
+        with self.lock:
+            self.players = {user_id: [username, games, wins] for user_id, username, games, wins in rows}
+            self.ranking = sorted((-wins, -games, user_id) for user_id, (_, games, wins) in self.players.items())
+            self.vip_users = dict(vip_users)
+            self.text = None
+
+    def record_game(self, totals):
+        """Учитывает завершённую игру: totals — {user_id: (username, записей, победа)}."""
+        with self.lock:
+            for user_id, (username, _, won) in totals.items():
+                player = self.players.get(user_id)
+                if player is None:
+                    player = self.players[user_id] = [username, 0, 0]
+                else:
+                    self._unrank(user_id, player)
+                player[0] = username
+                player[1] += 1
+                player[2] += won
+                bisect.insort(self.ranking, (-player[2], -player[1], user_id))
+            if totals:
+                self.text = None
+
+    def set_vip(self, user_id, username, is_vip):
+        with self.lock:
+            if is_vip:
+                self.vip_users[user_id] = username
+            else:
+                self.vip_users.pop(user_id, None)
+            self.text = None
+
+    def render(self):
+        """Текст /top; пересчитывается только после изменений."""
+        with self.lock:
+            if self.text is None:
+                self.text = self._render()
+            return self.text
+
+    def _unrank(self, user_id, player):
+        key = (-player[2], -player[1], user_id)
+        idx = bisect.bisect_left(self.ranking, key)
+        if idx < len(self.ranking) and self.ranking[idx] == key:
+            del self.ranking[idx]
+
+    def _render(self):
+        lines = ["🏆 Топ игроков:", ""]
+        if not self.ranking:
+            lines.append("Завершённых игр ещё не было!")
+        for idx, (_, _, user_id) in enumerate(self.ranking[:self.top_size], 1):
+            username, games, wins = self.players[user_id]
+            mark = "👑 " if user_id in self.vip_users else ""
+            lines.append(f"{idx}. {mark}{username} — побед: {wins}, игр: {games}")
+        lines += ["", "👑 VIP-участники:"]
+        lines.append(", ".join(self.vip_users.values()) if self.vip_users else "Список пустой!")
+        return "\n".join(lines)
@@ -0,0 +1,89 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+
+# Логгер бота; запись в поток вывода идёт из фонового потока QueueListener
+logger = logging.getLogger("game")
+logger.propagate = False
+
+# Доля записей, которые пишутся для шумных событий: {"chat_check": 0.01}
+sample_rates = {}
+
+listener = None
+
+
+class KeyValueFormatter(logging.Formatter):
+    """Строка вида: 2024-01-01T12:00:00 level=INFO event=update chat_id=-100 handler=start_game"""
+
+    def format(self, record):
+        parts = [self.formatTime(record, "%Y-%m-%dT%H:%M:%S"), f"level={record.levelname}", f"event={record.msg}"]
+        for key, value in getattr(record, "fields", {}).items():
+            parts.append(f"{key}={format_value(value)}")
+        if record.exc_info:
+            parts.append(f"exc={format_value(self.formatException(record.exc_info))}")
+        return " ".join(parts)
+
+
+def format_value(value):
+    text = str(value)
+    if not text or any(char in text for char in ' ="\n'):
+        return json.dumps(text, ensure_ascii=False)
+    return text
+
+
+def setup_logging(level="INFO", rates=None, stream=None):
+    """Подключает очередь записей и фоновый поток, который пишет их в stream."""
+    global listener
+    set_level(level)
+    sample_rates.update(rates or {})
+    if listener is not None:
+        return
+    records = queue.Queue()
+    handler = logging.StreamHandler(stream or sys.stdout)
+    handler.setFormatter(KeyValueFormatter())
+    listener = logging.handlers.QueueListener(records, handler)
+    logger.addHandler(logging.handlers.QueueHandler(records))
+    listener.start()
+    atexit.register(stop_logging)
+
+
+def stop_logging():
+    """Дописывает оставшиеся записи и останавливает фоновый поток."""
+    global listener
+    if listener is not None:
+        listener.stop()
+        listener = None
+
+
+def set_level(level):
+    """Меняет уровень на лету; возвращает False, если такого уровня нет."""
+    value = logging.getLevelName(str(level).upper())
+    if not isinstance(value, int):
+        return False
+    logger.setLevel(value)
+    return True
+
+
+def get_level():
+    return logging.getLevelName(logger.getEffectiveLevel())
+
+
+def log_event(event, level=logging.INFO, **fields):
+    """Пишет событие с полями key=value; шумные события — с долей из sample_rates."""
+    if not logger.isEnabledFor(level):
+        return
+    rate = sample_rates.get(event)
+    if rate is not None:
+        if random.random() >= rate:
+            return
+        fields["sample"] = rate
+    logger.log(level, event, extra={"fields": fields})
+
+
+def log_error(event, error, **fields):
+    """Событие-ошибка: всегда пишется, если уровень не выше ERROR."""
+    log_event(event, logging.ERROR, error=error, **fields)
@@ -0,0 +1,179 @@
+import bisect
+import functools
+import inspect
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Границы корзин гистограмм, секунды
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    """Счётчики по корзинам BUCKETS плюс сумма и количество наблюдений."""
+
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)  # Последняя — больше BUCKETS[-1]
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Оценка квантиля линейной интерполяцией внутри корзины."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        cumulative = 0
+        for idx, count in enumerate(self.counts):
+            if count and cumulative + count >= rank:
+                lower = BUCKETS[idx - 1] if idx else 0.0
+                upper = BUCKETS[idx] if idx < len(BUCKETS) else BUCKETS[-1]
+                return lower + (upper - lower) * (rank - cumulative) / count
+            cumulative += count
+        return BUCKETS[-1]
+
+
+class MetricsRegistry:
+    """Гистограммы, счётчики и вычисляемые значения в памяти процесса.
+
+    Метрика задаётся именем и метками: observe("handler_seconds", 0.002,
+    handler="start_game"). Наблюдение — одна блокировка, bisect и три
+    сложения, поэтому сбор можно не выключать. render() отдаёт всё в
+    текстовом формате Prometheus.
+    """
+
+    def __init__(self, prefix="game"):
+        self.prefix = prefix
+        self.lock = threading.Lock()
+        self.histograms = {}  # {(name, labels): Histogram}
+        self.counters = {}  # {(name, labels): число}
+        self.callbacks = {}  # {name: (kind, func)}
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(labels.items()))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(labels.items()))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def register(self, name, func, kind="gauge"):
+        """Значение, которое вычисляется при выдаче (размер очереди, число сессий)."""
+        self.callbacks[name] = (kind, func)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def timed(self, name, **labels):
+        """Декоратор: время вызова функции (или корутины) в гистограмму name."""
+        def decorator(func):
+            if inspect.iscoroutinefunction(func):
+                @functools.wraps(func)
+                async def async_wrapper(*args, **kwargs):
+                    with self.timer(name, **labels):
+                        return await func(*args, **kwargs)
+                return async_wrapper
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.timer(name, **labels):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def summary(self, name, quantiles=(0.5, 0.95, 0.99)):
+        """{метки: (количество, [квантили в секундах])} для гистограммы name."""
+        with self.lock:
+            return {labels: (histogram.count, [histogram.quantile(q) for q in quantiles])
+                    for (metric, labels), histogram in self.histograms.items() if metric == name}
+
+    def counter_values(self, name):
+        with self.lock:
+            return {labels: value for (metric, labels), value in self.counters.items() if metric == name}
+
+    def render(self):
+        """Все метрики в текстовом формате Prometheus."""
+        lines = []
+        with self.lock:
+            histograms = sorted((key, list(h.counts), h.total, h.count) for key, h in self.histograms.items())
+            counters = sorted(self.counters.items())
+        typed = set()
+        for (name, labels), counts, total, count in histograms:
+            full = f"{self.prefix}_{name}"
+            if full not in typed:
+                typed.add(full)
+                lines.append(f"# TYPE {full} histogram")
+            cumulative = 0
+            for bound, bucket in zip(BUCKETS + ("+Inf",), counts):
+                cumulative += bucket
+                lines.append(f"{full}_bucket{format_labels(labels + (('le', bound),))} {cumulative}")
+            lines.append(f"{full}_sum{format_labels(labels)} {total}")
+            lines.append(f"{full}_count{format_labels(labels)} {count}")
+        for (name, labels), value in counters:
+            full = f"{self.prefix}_{name}"
+            if full not in typed:
+                typed.add(full)
+                lines.append(f"# TYPE {full} counter")
+            lines.append(f"{full}{format_labels(labels)} {value}")
+        for name, (kind, func) in sorted(self.callbacks.items()):
+            full = f"{self.prefix}_{name}"
+            lines.append(f"# TYPE {full} {kind}")
+            lines.append(f"{full} {func()}")
+        return "\n".join(lines) + "\n"
+
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{escape_label(value)}"' for key, value in labels) + "}"
+
+
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# Метрики процесса: обработчики, SQLite и вызовы Telegram
+metrics = MetricsRegistry()
+
+
+def start_metrics_server(host, port, registry=metrics):
+    """Запускает в фоне HTTP-сервер с GET /metrics; возвращает сервер."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != "/metrics":
+                self.send_response(404)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            body = registry.render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    return server
@@ -0,0 +1,299 @@
+import asyncio
+import heapq
+import inspect
+import itertools
+import threading
+import time
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor
+from edit_scheduler import get_retry_after
+from logs import log_error
+from metrics import metrics
+
+# Приоритеты исходящих вызовов: меньше — раньше
+PRIORITY_CALLBACK = 0  # Ответы на нажатия кнопок
+PRIORITY_ANNOUNCE = 1  # Объявления игры: старт, ряды, победители
+PRIORITY_REPLY = 2  # Обычные ответы на команды
+PRIORITY_ERROR = 3  # Ответы об ошибках, их можно склеивать
+
+
+class TokenBucket:
+    """Ведро токенов: rate токенов в секунду, не больше capacity подряд."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0
+
+    def reserve(self, now):
+        """Берёт токен и возвращает 0 или сколько секунд ждать до токена."""
+        if now < self.paused_until:
+            return self.paused_until - now
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+    def pause(self, seconds):
+        """Запрещает вызовы на seconds секунд (ответ 429 от Telegram)."""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.tokens = 0
+
+
+class OutboundCall:
+    __slots__ = ("priority", "func", "args", "kwargs", "chat_id", "fold_key", "future", "attempts", "folded",
+                 "submitted_at", "started_at", "seq")
+
+    def __init__(self, priority, func, args, kwargs, chat_id, fold_key, seq):
+        self.priority = priority
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.chat_id = chat_id
+        self.fold_key = fold_key
+        self.future = Future()
+        self.attempts = 0
+        self.folded = 0
+        self.submitted_at = time.perf_counter()
+        self.started_at = None
+        self.seq = seq
+
+
+class OutboundDispatcher:
+    """Единая очередь исходящих вызовов Telegram.
+
+    Поток-планировщик выбирает вызовы по приоритету с учётом общего ведра
+    токенов и ведра каждого чата, а выполняет их пул из concurrency потоков
+    (корутины AsyncTeleBot — задачами в переданном цикле событий), поэтому
+    пропускная способность не упирается во время одного запроса. Вызовы
+    одного чата выполняются по одному и в порядке очереди: следующий ждёт,
+    пока закончится предыдущий. Вызов, упёршийся в лимит чата, ждёт в
+    отложенных, не задерживая другие чаты. Ответы на нажатия кнопок
+    (PRIORITY_CALLBACK) берут токены из своего ведра callback_rate, а не из
+    общего: сообщения в чаты не задерживают их, и наоборот. На 429 вызов повторяется через
+    retry_after, а чат ставится на паузу. Вызовы с одинаковым fold_key,
+    ещё не отправленные, склеиваются: уходит только последний.
+    """
+
+    def __init__(self, global_rate=30, chat_rate=20 / 60, chat_burst=5, max_attempts=5, loop=None, concurrency=8,
+                 callback_rate=300):
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.callback_bucket = TokenBucket(callback_rate, callback_rate)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.chat_buckets = {}
+        self.max_attempts = max_attempts
+        self.loop = loop
+        self.concurrency = concurrency
+        self.pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="outbound-call")
+        self.ready = []  # Куча (priority, seq, call)
+        self.delayed = []  # Куча (ready_at, seq, call)
+        self.busy_chats = {}  # {chat_id: выполняющийся или повторяемый вызов}
+        self.blocked = {}  # {chat_id: [(priority, seq, call)]} — ждут окончания вызова своего чата
+        self.in_flight = 0
+        self.pending_folds = {}  # {fold_key: call}
+        self.seq = itertools.count()
+        self.condition = threading.Condition()
+        self.thread = None
+        self.stopped = False
+        self.submitted = 0
+        self.sent = 0
+        self.folded = 0
+        self.retried = 0
+        self.failed = 0
+
+    def set_global_rate(self, rate, callback_rate=None):
+        """Меняет общий лимит (и лимит ответов на кнопки), например на долю лимита бота для воркера supervisor.py."""
+        with self.condition:
+            self.global_bucket = TokenBucket(rate, max(rate, 1))
+            if callback_rate is not None:
+                self.callback_bucket = TokenBucket(callback_rate, max(callback_rate, 1))
+
+    def submit(self, priority, func, *args, chat_id=None, fold_key=None, **kwargs):
+        """Ставит вызов в очередь и возвращает Future с его результатом."""
+        with self.condition:
+            self.submitted += 1
+            if fold_key is not None:
+                pending = self.pending_folds.get(fold_key)
+                if pending is not None:
+                    # Ещё не отправлено — заменяем текст последним
+                    pending.args, pending.kwargs = args, kwargs
+                    pending.folded += 1
+                    self.folded += 1
+                    return pending.future
+            call = OutboundCall(priority, func, args, kwargs, chat_id, fold_key, next(self.seq))
+            if fold_key is not None:
+                self.pending_folds[fold_key] = call
+            heapq.heappush(self.ready, (priority, call.seq, call))
+            self._ensure_thread()
+            self.condition.notify()
+            return call.future
+
+    def call(self, priority, func, *args, chat_id=None, **kwargs):
+        """Выполняет вызов через очередь и ждёт результата."""
+        return self.submit(priority, func, *args, chat_id=chat_id, **kwargs).result()
+
+    def forget_chat(self, chat_id):
+        """Удаляет ведро чата (его сессия выселена), если вызовов этого чата не выполняется.
+
+        Простоявшее ведро и так полно, поэтому новое, созданное при следующем вызове, ничем не отличается.
+        """
+        with self.condition:
+            if chat_id not in self.busy_chats and chat_id not in self.blocked:
+                self.chat_buckets.pop(chat_id, None)
+
+    def stats(self):
+        with self.condition:
+            return {
+                "submitted": self.submitted,
+                "sent": self.sent,
+                "folded": self.folded,
+                "retried": self.retried,
+                "failed": self.failed,
+                "queued": len(self.ready) + len(self.delayed) + sum(map(len, self.blocked.values())),
+                "in_flight": self.in_flight,
+            }
+
+    def stop(self, timeout=5):
+        """Дожидается отправки очереди (не дольше timeout) и останавливает поток."""
+        deadline = time.monotonic() + timeout
+        with self.condition:
+            while ((self.ready or self.delayed or self.blocked or self.in_flight) and self.thread
+                   and time.monotonic() < deadline):
+                self.condition.wait(0.1)
+            self.stopped = True
+            self.condition.notify()
+        self.pool.shutdown(wait=False)
+
+    def _ensure_thread(self):
+        if self.thread is None and not self.stopped:
+            self.thread = threading.Thread(target=self._run, name="outbound", daemon=True)
+            self.thread.start()
+
+    def _chat_bucket(self, chat_id):
+        bucket = self.chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = self.chat_buckets[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+        return bucket
+
+    def _bucket(self, call):
+        return self.callback_bucket if call.priority == PRIORITY_CALLBACK else self.global_bucket
+
+    def _next_call(self):
+        """Ждёт вызов, который можно начать прямо сейчас."""
+        with self.condition:
+            while not self.stopped:
+                now = time.monotonic()
+                while self.delayed and self.delayed[0][0] <= now:
+                    _, seq, call = heapq.heappop(self.delayed)
+                    heapq.heappush(self.ready, (call.priority, seq, call))
+                if self.ready and self.in_flight < self.concurrency:
+                    _, seq, call = self.ready[0]
+                    if self.busy_chats.get(call.chat_id, call) is not call:
+                        # Предыдущий вызов этого чата ещё не закончен: ждём его, сохраняя порядок
+                        heapq.heappop(self.ready)
+                        self.blocked.setdefault(call.chat_id, []).append((call.priority, seq, call))
+                        continue
+                    wait = self._bucket(call).reserve(now)
+                    if wait:
+                        self.condition.wait(wait)
+                        continue
+                    heapq.heappop(self.ready)
+                    if call.chat_id is not None:
+                        wait = self._chat_bucket(call.chat_id).reserve(now)
+                        if wait:
+                            # Лимит этого чата: токен общего ведра возвращаем
+                            self._bucket(call).tokens += 1
+                            heapq.heappush(self.delayed, (now + wait, seq, call))
+                            continue
+                        self.busy_chats[call.chat_id] = call
+                    if call.fold_key is not None:
+                        self.pending_folds.pop(call.fold_key, None)
+                    self.in_flight += 1
+                    return call
+                self.condition.wait(self.delayed[0][0] - now if self.delayed else None)
+            return None
+
+    def _run(self):
+        while True:
+            call = self._next_call()
+            if call is None:
+                return
+            self._start(call)
+
+    def _start(self, call):
+        call.attempts += 1
+        call.started_at = time.perf_counter()
+        if call.attempts == 1:
+            metrics.observe("outbound_wait_seconds", call.started_at - call.submitted_at)
+        if self.loop is not None and inspect.iscoroutinefunction(call.func):
+            # Корутина AsyncTeleBot: задача в цикле событий, поток планировщика её не ждёт
+            try:
+                future = asyncio.run_coroutine_threadsafe(call.func(*call.args, **call.kwargs), self.loop)
+            except Exception as e:
+                self._finish(call, None, e)
+                return
+            future.add_done_callback(lambda done: self._finish(call, *future_outcome(done)))
+            return
+        self.pool.submit(self._execute, call)
+
+    def _execute(self, call):
+        try:
+            result = call.func(*call.args, **call.kwargs)
+            if asyncio.iscoroutine(result):
+                result = asyncio.run_coroutine_threadsafe(result, self.loop).result()
+        except Exception as e:
+            self._finish(call, None, e)
+            return
+        self._finish(call, result, None)
+
+    def _finish(self, call, result, error):
+        method = getattr(call.func, "__name__", "call")
+        metrics.observe("telegram_api_seconds", time.perf_counter() - call.started_at, method=method)
+        if error is not None:
+            retry_after = get_retry_after(error)
+            metrics.inc("telegram_api_calls_total", method=method,
+                        outcome="rate_limited" if retry_after is not None else "error")
+            with self.condition:
+                self.in_flight -= 1
+                if retry_after is not None and call.attempts < self.max_attempts:
+                    # Чат остаётся занят этим вызовом, чтобы следующие не обогнали повтор
+                    self.retried += 1
+                    if call.chat_id is not None:
+                        self._chat_bucket(call.chat_id).pause(retry_after)
+                    heapq.heappush(self.delayed, (time.monotonic() + retry_after, call.seq, call))
+                    self.condition.notify_all()
+                    return
+                self.failed += 1
+                self._release(call)
+            if not call.future.set_running_or_notify_cancel():
+                return
+            call.future.set_exception(error)
+            log_error("outbound_failed", error, method=method, chat_id=call.chat_id, attempts=call.attempts)
+            return
+        metrics.inc("telegram_api_calls_total", method=method, outcome="ok")
+        with self.condition:
+            self.in_flight -= 1
+            self.sent += 1
+            self._release(call)
+        if call.future.set_running_or_notify_cancel():
+            call.future.set_result(result)
+
+    def _release(self, call):
+        # Под condition: чат свободен, ждавшие его вызовы возвращаются в очередь
+        if call.chat_id is not None and self.busy_chats.get(call.chat_id) is call:
+            del self.busy_chats[call.chat_id]
+            for item in self.blocked.pop(call.chat_id, ()):
+                heapq.heappush(self.ready, item)
+        self.condition.notify_all()
+
+
+def future_outcome(future):
+    """(результат, ошибка) завершённого Future."""
+    if future.cancelled():
+        return None, CancelledError()
+    error = future.exception()
+    return (None, error) if error is not None else (future.result(), None)
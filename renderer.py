@@ -0,0 +1,167 @@
+import threading
+from concurrent.futures import CancelledError, Future
+from edit_scheduler import is_not_modified
+
+# Telegram принимает до 4096 символов; запас на разницу в подсчёте символов
+PAGE_LIMIT = 4000
+
+
+def format_entry(idx, entry):
+    """Строка записи в списке игроков."""
+    if entry.packed is not None:
+        return f"{idx}. {entry.username} {' '.join(map(str, entry.packed))}\n"
+    return f"{idx}. {entry.username}\n"
+
+
+def page_header(page):
+    return "📋 Список игроков:\n\n" if page == 0 else f"📋 Список игроков (стр. {page + 1}):\n\n"
+
+
+def split_messages(lines, header):
+    """Склеивает строки в сообщения не длиннее PAGE_LIMIT; header(номер) — заголовок сообщения."""
+    messages, text = [], header(0)
+    for line in lines:
+        if len(text) + len(line) > PAGE_LIMIT and text != header(len(messages)):
+            messages.append(text)
+            text = header(len(messages))
+        text += line
+    messages.append(text)
+    return messages
+
+
+class PlayerListRenderer:
+    """Список игроков, разбитый на страницы не длиннее PAGE_LIMIT.
+
+    Запись дописывается в последнюю страницу, а если та заполнена — открывает
+    новую; от строки записи при добавлении остаётся только её длина. Страницы
+    хранят ссылки на сами записи, а текст страницы собирается из них при
+    отправке: строки всего списка в памяти не держатся. Добавление стоит O(1),
+    сборка страницы — не больше PAGE_LIMIT символов.
+    Номера страниц, изменённых с последней отправки, копятся в dirty.
+    Записи добавляются в потоке обработчика, а страницы отправляются из
+    планировщика правок, поэтому всё идёт под lock; generation меняется при
+    каждом reset(), чтобы отправка старого списка не задела новый.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.generation = 0
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.pages = [[]]  # Записи по страницам
+            self.starts = [1]  # Номер первой записи каждой страницы
+            self.lengths = [len(page_header(0))]  # Длина текста каждой страницы
+            self.count = 0
+            self.dirty = set()
+            self.generation += 1
+
+    def append(self, entry):
+        with self.lock:
+            self.count += 1
+            length = len(format_entry(self.count, entry))
+            if self.pages[-1] and self.lengths[-1] + length > PAGE_LIMIT:
+                self.pages.append([])
+                self.starts.append(self.count)
+                self.lengths.append(len(page_header(len(self.pages) - 1)))
+            self.pages[-1].append(entry)
+            self.lengths[-1] += length
+            self.dirty.add(len(self.pages) - 1)
+
+    def page_text(self, page):
+        with self.lock:
+            return self._text(page)
+
+    def take_page(self, page):
+        """Текст страницы; до следующего изменения она не считается изменённой."""
+        with self.lock:
+            self.dirty.discard(page)
+            return self._text(page)
+
+    def mark_dirty(self, *pages, generation=None):
+        """Помечает страницы изменёнными; страницы списка до reset() (другой generation) пропускаются."""
+        with self.lock:
+            if generation is None or generation == self.generation:
+                self.dirty.update(pages)
+
+    def take_dirty(self):
+        """Забирает изменённые страницы по порядку: generation и пары (номер, текст)."""
+        with self.lock:
+            pages, self.dirty = sorted(self.dirty), set()
+            return self.generation, [(page, self._text(page)) for page in pages]
+
+    def add_page_message(self, generation, message_ids, message_id):
+        """Запоминает сообщение новой страницы, если список с тех пор не сбрасывался."""
+        with self.lock:
+            if generation != self.generation:
+                return False
+            message_ids.append(message_id)
+            return True
+
+    def _text(self, page):
+        start = self.starts[page]
+        return page_header(page) + "".join(format_entry(start + idx, entry)
+                                           for idx, entry in enumerate(self.pages[page]))
+
+
+def flush_pages(game, edit_page, send_page, record_page=None):
+    """Отправляет изменённые страницы списка игры; возвращает Future.
+
+    Первая страница — закреплённое сообщение, остальные — сообщения из
+    game.page_message_ids. edit_page(page, message_id, text) ставит правку
+    страницы в очередь, send_page(text) — отправку новой; обе возвращают
+    Future, у send_page — с отправленным сообщением. record_page(message_id)
+    сохраняет новую страницу, если игра за это время не сброшена.
+    Тексты страниц снимаются разом, а каждая следующая страница ставится в
+    очередь из колбэка предыдущей: новые страницы получают message_id по
+    порядку, и вызывающий поток ничего не ждёт. При ошибке неотправленные
+    страницы снова помечаются изменёнными, и Future завершается этой ошибкой.
+    """
+    renderer = game.player_list
+    generation, pages = renderer.take_dirty()
+    pinned_message_id, message_ids = game.pinned_message_id, game.page_message_ids
+    done = Future()
+    if generation != renderer.generation:
+        # Игру сбросили, пока снимались страницы: сообщения уже от новой игры
+        pages = []
+
+    def fail(idx, error):
+        renderer.mark_dirty(*(page for page, _ in pages[idx:]), generation=generation)
+        done.set_exception(error)
+
+    def send(idx):
+        if idx == len(pages):
+            done.set_result(None)
+            return
+        page, text = pages[idx]
+        is_new = page > len(message_ids)
+        try:
+            if page == 0:
+                future = edit_page(page, pinned_message_id, text)
+            elif not is_new:
+                future = edit_page(page, message_ids[page - 1], text)
+            else:
+                future = send_page(text)
+        except Exception as e:
+            fail(idx, e)
+            return
+        future.add_done_callback(lambda result: sent(idx, is_new, result))
+
+    def sent(idx, is_new, result):
+        error = CancelledError() if result.cancelled() else result.exception()
+        if error is not None and not is_not_modified(error):
+            fail(idx, error)
+            return
+        if error is None and is_new:
+            try:
+                message_id = result.result().message_id
+                if renderer.add_page_message(generation, message_ids, message_id) and record_page:
+                    record_page(message_id)
+            except Exception as e:
+                fail(idx + 1, e)
+                return
+        send(idx + 1)
+
+    send(0)
+    return done
@@ -0,0 +1,147 @@
+import inspect
+import threading
+import time
+from logs import log_event
+from metrics import metrics
+
+
+class UpdateRouter:
+    """Маршрутизация обновлений за один проход вместо фильтров на каждом обработчике.
+
+    Текст сообщения классифицируется один раз: по первому символу — команда
+    из таблицы команд или префикс вроде "@", иначе — поиск в заранее
+    приведённом к нижнему регистру множестве ключевых слов. Обработчики с
+    game_only=True участвуют только пока в чате идёт игра (game_active(chat_id)).
+    Всё, что никуда не подошло, отбрасывается ещё в фильтре telebot, до
+    запуска обработчика и без передачи в пул потоков.
+
+    Использование: фильтр match_message/match_callback запоминает выбранный
+    обработчик в обновлении, а единый обработчик вызывает dispatch().
+    На каждое обработанное обновление пишется событие update с чатом,
+    пользователем, обработчиком, исходом и временем обработки, а время
+    попадает в гистограмму handler_seconds. Нажатию кнопки фильтр
+    проставляет received_at — от него считается время до ответа на нажатие.
+    """
+
+    def __init__(self, game_active):
+        self.game_active = game_active
+        self.commands = {}  # {"game": handler}
+        self.prefixes = {}  # {"@": (handler, game_only)}
+        self.keywords = {}  # {"бинго": (handler, game_only)}
+        self.longest_keyword = 0
+        self.callbacks = {}  # {callback_data: handler}
+        self.filtered = 0
+        self.dispatched = 0
+        self.lock = threading.Lock()
+
+    def command(self, *names):
+        def decorator(handler):
+            for name in names:
+                self.commands[name] = handler
+            return handler
+        return decorator
+
+    def prefix(self, char, game_only=False):
+        def decorator(handler):
+            self.prefixes[char] = (handler, game_only)
+            return handler
+        return decorator
+
+    def keyword(self, *words, game_only=False):
+        def decorator(handler):
+            for word in words:
+                self.keywords[word.lower()] = (handler, game_only)
+                self.longest_keyword = max(self.longest_keyword, len(word))
+            return handler
+        return decorator
+
+    def callback(self, *data):
+        def decorator(handler):
+            for value in data:
+                self.callbacks[value] = handler
+            return handler
+        return decorator
+
+    def classify(self, chat_id, text):
+        """Обработчик для текста сообщения или None."""
+        if not text:
+            return None
+        first = text[0]
+        if first == "/":
+            # "/num2@bot 3" -> "num2"
+            return self.commands.get(text.split(maxsplit=1)[0][1:].split("@", 1)[0])
+        route = self.prefixes.get(first)
+        if route is None:
+            stripped = text.strip()
+            if len(stripped) > self.longest_keyword:
+                return None
+            route = self.keywords.get(stripped.lower())
+            if route is None:
+                return None
+        handler, game_only = route
+        if game_only and not self.game_active(chat_id):
+            return None
+        return handler
+
+    def match_message(self, message):
+        """Фильтр для telebot: выбирает обработчик и запоминает его в message.route."""
+        message.route_chat_id = message.chat.id
+        message.route = self.classify(message.chat.id, message.text)
+        self._count(message.route)
+        return message.route is not None
+
+    def match_callback(self, call):
+        call.received_at = time.perf_counter()
+        call.route_chat_id = call.message.chat.id if call.message else None
+        call.route = self.callbacks.get(call.data)
+        self._count(call.route)
+        return call.route is not None
+
+    def dispatch(self, update):
+        """Вызывает выбранный фильтром обработчик (для корутин возвращает корутину)."""
+        started = time.perf_counter()
+        try:
+            result = update.route(update)
+        except Exception as e:
+            self._log(update, started, "error", e)
+            raise
+        if inspect.iscoroutine(result):
+            return self._finish(update, started, result)
+        self._log(update, started, "ok")
+        return result
+
+    async def _finish(self, update, started, coroutine):
+        try:
+            result = await coroutine
+        except Exception as e:
+            self._log(update, started, "error", e)
+            raise
+        self._log(update, started, "ok")
+        return result
+
+    def _log(self, update, started, outcome, error=None):
+        elapsed = time.perf_counter() - started
+        handler = update.route.__name__
+        metrics.observe("handler_seconds", elapsed, handler=handler)
+        metrics.inc("updates_total", handler=handler, outcome=outcome)
+        fields = {
+            "chat_id": update.route_chat_id,
+            "user_id": update.from_user.id,
+            "handler": handler,
+            "outcome": outcome,
+            "ms": round(elapsed * 1000, 2),
+        }
+        if error is not None:
+            fields["error"] = error
+        log_event("update", **fields)
+
+    def stats(self):
+        with self.lock:
+            return {"dispatched": self.dispatched, "filtered": self.filtered}
+
+    def _count(self, route):
+        with self.lock:
+            if route is None:
+                self.filtered += 1
+            else:
+                self.dispatched += 1
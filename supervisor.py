@@ -0,0 +1,266 @@
+import multiprocessing
+import os
+import queue
+import signal
+import sys
+import threading
+import time
+from multiprocessing.connection import wait
+from telebot import apihelper
+from telebot.types import Update
+from config import BOT_TOKEN, DATABASE_URL, LOG_LEVEL, LOG_SAMPLE_RATES, METRICS_HOST, METRICS_PORT
+from config import OUTBOUND_GLOBAL_RATE, OUTBOUND_CALLBACK_RATE, UPDATE_BACKLOG_POLICY, UPDATE_MAX_AGE, WORKER_PROCESSES, WORKER_QUEUE_SIZE
+from database import Storage
+from updates import UpdateTracker, BACKLOG_FAST_FORWARD
+from webhook import chat_id_of
+from logs import setup_logging, stop_logging, log_event, log_error
+from metrics import start_metrics_server
+
+POLL_TIMEOUT = 20  # Секунд long polling на один getUpdates
+RESTART_DELAY = 1.0  # Пауза перед перезапуском упавшего воркера
+MAX_RESTART_DELAY = 60.0  # Предел паузы, если воркер падает снова и снова
+STABLE_AFTER = 60.0  # Воркер, проживший дольше, снова перезапускается с RESTART_DELAY
+
+
+def shard_of(chat_id, workers):
+    """Номер воркера для чата; обновления без чата идут в воркер 0."""
+    return chat_id % workers if chat_id is not None else 0
+
+
+class Supervisor:
+    """Воркеры-процессы, между которыми обновления делятся по чатам.
+
+    Каждый воркер — отдельный процесс с собственными main и handlers
+    (сессии, таймеры, очередь исходящих с долей общего лимита) и своей
+    очередью обновлений.
+    Чат всегда попадает в один воркер (shard_of), поэтому игра чата
+    обрабатывается по порядку и живёт в памяти одного процесса. Журнал,
+    таймеры, VIP, бонусы и архив лежат в общей базе SQLite (WAL); когда
+    воркер записывает VIP, бонусы или архив, он присылает событие в events, и
+    остальные воркеры перечитывают эти данные из базы. Упавший воркер
+    перезапускается с нарастающей паузой и восстанавливает свои игры из
+    журнала; обновления его чатов тем временем ждут в его очереди, а при
+    переполнении отбрасываются — другие чаты это не задерживает.
+    """
+
+    def __init__(self, workers=WORKER_PROCESSES, queue_size=WORKER_QUEUE_SIZE):
+        # spawn: воркер не наследует подключения SQLite и потоки процесса-родителя
+        self.context = multiprocessing.get_context("spawn")
+        self.workers = workers
+        self.queues = [self.context.Queue(maxsize=queue_size) for _ in range(workers)]
+        self.events = self.context.Queue()
+        self.processes = [None] * workers
+        self.started_at = [0.0] * workers
+        self.delays = [RESTART_DELAY] * workers
+        self.restart_at = {}  # {shard: time.monotonic() перезапуска}
+        self.restarts = [0] * workers
+        self.dropped = [0] * workers
+        self.dispatched = 0
+        self.stats_lock = threading.Lock()
+        self.stopping = threading.Event()
+        self.threads = [threading.Thread(target=self._monitor, name="supervisor-monitor", daemon=True),
+                        threading.Thread(target=self._forward_events, name="supervisor-events", daemon=True)]
+
+    def start(self):
+        for shard in range(self.workers):
+            self._spawn(shard)
+        for thread in self.threads:
+            thread.start()
+
+    def dispatch(self, data):
+        """Ставит обновление (JSON Telegram) в очередь воркера его чата; False, если очередь полна."""
+        shard = shard_of(chat_id_of(data), self.workers)
+        try:
+            self.queues[shard].put_nowait(("update", data))
+        except queue.Full:
+            with self.stats_lock:
+                self.dropped[shard] += 1
+            log_error("worker_queue_full", "queue full", shard=shard, update_id=data.get("update_id"))
+            return False
+        with self.stats_lock:
+            self.dispatched += 1
+        return True
+
+    def stop(self, timeout=10):
+        """Просит воркеры доработать очереди и выйти; зависшие завершаются принудительно."""
+        self.stopping.set()
+        for q in self.queues:
+            try:
+                q.put(("stop", None), timeout=1)
+            except queue.Full:
+                pass
+        deadline = time.monotonic() + timeout
+        for shard, process in enumerate(self.processes):
+            if process is None:
+                continue
+            process.join(max(0, deadline - time.monotonic()))
+            if process.is_alive():
+                log_error("worker_stop_timeout", "terminated", shard=shard, pid=process.pid)
+                process.terminate()
+                process.join()
+        self.events.put(None)
+        for thread in self.threads:
+            thread.join()
+
+    def stats(self):
+        with self.stats_lock:
+            return {
+                "workers": self.workers,
+                "dispatched": self.dispatched,
+                "dropped": list(self.dropped),
+                "restarts": list(self.restarts),
+                "queue_depth": [q.qsize() for q in self.queues],
+            }
+
+    def _spawn(self, shard):
+        process = self.context.Process(target=run_worker, args=(shard, self.workers, self.queues[shard], self.events),
+                                       name=f"bot-worker-{shard}")
+        process.start()
+        self.processes[shard] = process
+        self.started_at[shard] = time.monotonic()
+        log_event("worker_started", shard=shard, pid=process.pid)
+
+    def _monitor(self):
+        while not self.stopping.is_set():
+            now = time.monotonic()
+            for shard, at in list(self.restart_at.items()):
+                if at <= now and not self.stopping.is_set():
+                    del self.restart_at[shard]
+                    with self.stats_lock:
+                        self.restarts[shard] += 1
+                    self._spawn(shard)
+            alive = {self.processes[shard].sentinel: shard for shard in range(self.workers)
+                     if shard not in self.restart_at}
+            timeout = min([1.0] + [at - now for at in self.restart_at.values()])
+            for sentinel in wait(list(alive), timeout=max(0, timeout)):
+                if self.stopping.is_set():
+                    return
+                self._exited(alive[sentinel])
+
+    def _exited(self, shard):
+        process = self.processes[shard]
+        process.join()
+        uptime = time.monotonic() - self.started_at[shard]
+        # Воркер, падающий сразу после старта, перезапускается всё реже
+        delay = RESTART_DELAY if uptime > STABLE_AFTER else self.delays[shard]
+        self.delays[shard] = min(MAX_RESTART_DELAY, delay * 2)
+        self.restart_at[shard] = time.monotonic() + delay
+        log_error("worker_exited", f"exit code {process.exitcode}", shard=shard, pid=process.pid,
+                  uptime=round(uptime, 1), restart_in=delay)
+
+    def _forward_events(self):
+        while True:
+            event = self.events.get()
+            if event is None:
+                return
+            kind, source = event
+            for shard, q in enumerate(self.queues):
+                if shard == source:
+                    continue
+                try:
+                    q.put((kind, None), timeout=1)
+                except queue.Full:
+                    # Воркер не успевает; свежие данные он прочитает при следующем событии или перезапуске
+                    log_error("worker_event_dropped", "queue full", shard=shard, kind=kind)
+
+
+# Процесс-воркер: свои main и handlers, только свои чаты, обновления из очереди по одному
+def run_worker(shard, workers, updates, events):
+    # Ctrl+C получает вся группа процессов; воркер останавливает supervisor сообщением "stop"
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    import main as bot_main
+    import handlers
+
+    def owns(chat_id):
+        return shard_of(chat_id, workers) == shard
+
+    # Обработчики выполняются по порядку прямо в цикле воркера, как в webhook-воркерах
+    bot_main.bot.threaded = False
+    handlers.outbound.set_global_rate(OUTBOUND_GLOBAL_RATE / workers, OUTBOUND_CALLBACK_RATE / workers)
+    handlers.storage.on_shared_change = lambda: events.put(("shared", shard))
+    handlers.start_up(handlers.edit_scheduler, owns)
+    log_event("timers_restored", shard=shard, count=handlers.timers.restore(owns))
+    if METRICS_PORT:
+        start_metrics_server(METRICS_HOST, METRICS_PORT + 1 + shard)
+    log_event("worker_ready", shard=shard, pid=os.getpid(), games=len(handlers.sessions.active()))
+    try:
+        while True:
+            kind, data = updates.get()
+            if kind == "stop":
+                break
+            if kind == "shared":
+                handlers.reload_shared()
+                continue
+            try:
+                bot_main.process_updates([Update.de_json(data)])
+            except Exception as e:
+                log_error("worker_update_failed", e, shard=shard, update_id=data.get("update_id"))
+    finally:
+        # Завершаемся здесь, пока пишутся логи; atexit из main.py вызовет shut_down()
+        # ещё раз при выходе процесса (spawn), но повторный вызов ничего не делает
+        handlers.shut_down()
+        stop_logging()
+
+
+# Пропуск накопившихся обновлений: offset за последним из них
+def skip_pending():
+    pending = apihelper.get_updates(BOT_TOKEN, offset=-1, limit=1, timeout=1, long_polling_timeout=1)
+    return pending[-1]["update_id"] + 1 if pending else None
+
+
+# Long polling в процессе-супервизоре: отсев повторов и устаревших, раздача воркерам
+def poll(supervisor, tracker, offset):
+    errors = 0
+    while True:
+        try:
+            batch = apihelper.get_updates(BOT_TOKEN, offset=offset, timeout=POLL_TIMEOUT,
+                                          long_polling_timeout=POLL_TIMEOUT)
+            errors = 0
+        except Exception as e:
+            errors += 1
+            log_error("polling_failed", e, attempt=errors)
+            time.sleep(min(30, errors * 2))
+            continue
+        if batch:
+            offset = batch[-1]["update_id"] + 1
+            accepted = {update.update_id for update in tracker.filter([Update.de_json(data) for data in batch])}
+            for data in batch:
+                if data["update_id"] in accepted:
+                    supervisor.dispatch(data)
+        if tracker.flush_due():
+            tracker.flush()
+
+
+def run_supervisor(workers):
+    setup_logging(LOG_LEVEL, LOG_SAMPLE_RATES)
+    # SIGTERM завершает процесс так же, как Ctrl+C: с остановкой воркеров и сохранением update_id
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    storage = Storage(DATABASE_URL)
+    # Миграции выполняются один раз здесь, до старта воркеров
+    version = storage.open()
+    tracker = UpdateTracker(storage, policy=UPDATE_BACKLOG_POLICY, max_age=UPDATE_MAX_AGE)
+    last_update_id = tracker.load()
+    offset = last_update_id + 1 if last_update_id else None
+    if UPDATE_BACKLOG_POLICY == BACKLOG_FAST_FORWARD:
+        offset = skip_pending() or offset
+    log_event("bot_started", mode="supervisor", workers=workers, schema=version, last_update_id=last_update_id)
+    if METRICS_PORT:
+        start_metrics_server(METRICS_HOST, METRICS_PORT)
+    supervisor = Supervisor(workers)
+    supervisor.start()
+    try:
+        poll(supervisor, tracker, offset)
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        tracker.flush()
+        supervisor.stop()
+        log_event("supervisor_stats", **supervisor.stats())
+        log_event("update_stats", **tracker.stats())
+        storage.close()
+        stop_logging()
+
+
+# Запуск: python supervisor.py [число воркеров]
+if __name__ == "__main__":
+    run_supervisor(int(sys.argv[1]) if len(sys.argv) > 1 else WORKER_PROCESSES)
@@ -0,0 +1,171 @@
+import asyncio
+import heapq
+import inspect
+import itertools
+import json
+import threading
+import time
+from logs import log_error
+from metrics import metrics
+
+
+class TimerScheduler:
+    """Отложенные события игр на одном фоновом потоке.
+
+    Таймер задаётся чатом и видом (kind): в чате может ждать только один
+    таймер каждого вида, повторный schedule() его переносит. Сроки лежат в
+    куче, отменённые и перенесённые записи кучи просто пропускаются, поэтому
+    schedule/cancel стоят O(log n) даже при тысячах таймеров. Каждый таймер
+    дублируется строкой в таблице timers и переживает перезапуск: restore()
+    поднимает их, просроченные срабатывают сразу.
+    Обработчик вида регистрируется через handler(kind) и получает
+    (chat_id, payload); если он возвращает корутину, она выполняется в
+    цикле событий loop (AsyncTeleBot).
+    Строка таблицы timers — (chat_id, kind, due_at по time.time(), payload
+    в JSON), по одной на чат и вид; в памяти те же таймеры лежат в timers
+    и в куче сроков heap.
+    """
+
+    def __init__(self, storage, loop=None):
+        self.storage = storage
+        self.loop = loop
+        self.handlers = {}  # {kind: func}
+        self.timers = {}  # {(chat_id, kind): (due_at, payload)}
+        self.heap = []  # Куча (due_at, seq, (chat_id, kind))
+        self.seq = itertools.count()
+        self.condition = threading.Condition()
+        self.thread = None
+        self.stopped = False
+        self.fired = 0
+        self.failed = 0
+
+    def handler(self, kind):
+        def decorator(func):
+            self.handlers[kind] = func
+            return func
+        return decorator
+
+    def schedule(self, chat_id, kind, delay, **payload):
+        """Ставит (или переносит) таймер вида kind в чате через delay секунд."""
+        due_at = time.time() + delay
+        try:
+            with metrics.timer("sqlite_seconds", op="timer_write"), self.storage.lock, self.storage.conn:
+                self.storage.conn.execute(
+                    "INSERT OR REPLACE INTO timers (chat_id, kind, due_at, payload) VALUES (?, ?, ?, ?)",
+                    (chat_id, kind, due_at, json.dumps(payload, ensure_ascii=False)))
+        except Exception as e:
+            # Таймер всё равно сработает, но не переживёт перезапуск
+            log_error("timer_write_failed", e, chat_id=chat_id, kind=kind)
+        with self.condition:
+            self._push(chat_id, kind, due_at, payload)
+            self._ensure_thread()
+            self.condition.notify()
+
+    def cancel(self, chat_id, kind=None):
+        """Отменяет таймер вида kind в чате, а без kind — все таймеры чата."""
+        with self.condition:
+            keys = [key for key in self.timers if key[0] == chat_id and (kind is None or key[1] == kind)]
+            for key in keys:
+                del self.timers[key]
+        if not keys:
+            return
+        try:
+            with metrics.timer("sqlite_seconds", op="timer_cancel"), self.storage.lock, self.storage.conn:
+                self.storage.conn.executemany("DELETE FROM timers WHERE chat_id = ? AND kind = ?", keys)
+        except Exception as e:
+            log_error("timer_write_failed", e, chat_id=chat_id, kind=kind)
+
+    def due_at(self, chat_id, kind):
+        """Время срабатывания таймера (time.time()) или None."""
+        with self.condition:
+            timer = self.timers.get((chat_id, kind))
+            return timer[0] if timer else None
+
+    def restore(self, owns=None):
+        """Поднимает таймеры из базы после перезапуска; возвращает их число.
+
+        owns(chat_id) отбирает чаты, которые обслуживает этот процесс (воркер supervisor.py).
+        """
+        with metrics.timer("sqlite_seconds", op="timer_restore"), self.storage.lock:
+            rows = self.storage.conn.execute("SELECT chat_id, kind, due_at, payload FROM timers").fetchall()
+        if owns is not None:
+            rows = [row for row in rows if owns(row[0])]
+        with self.condition:
+            for chat_id, kind, due_at, payload in rows:
+                self._push(chat_id, kind, due_at, json.loads(payload))
+            if rows:
+                self._ensure_thread()
+                self.condition.notify()
+        return len(rows)
+
+    def stats(self):
+        with self.condition:
+            return {"pending": len(self.timers), "fired": self.fired, "failed": self.failed}
+
+    def stop(self):
+        """Останавливает поток; несработавшие таймеры остаются в базе."""
+        with self.condition:
+            self.stopped = True
+            self.condition.notify()
+        if self.thread:
+            self.thread.join()
+
+    def _push(self, chat_id, kind, due_at, payload):
+        key = (chat_id, kind)
+        self.timers[key] = (due_at, payload)
+        heapq.heappush(self.heap, (due_at, next(self.seq), key))
+        if len(self.heap) > 2 * len(self.timers) + 64:
+            # Много перенесённых и отменённых записей — собираем кучу заново
+            self.heap = [(due, next(self.seq), key) for key, (due, _) in self.timers.items()]
+            heapq.heapify(self.heap)
+
+    def _ensure_thread(self):
+        if self.thread is None and not self.stopped:
+            self.thread = threading.Thread(target=self._run, name="timers", daemon=True)
+            self.thread.start()
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while not self.stopped:
+                    if self.heap:
+                        due_at, _, key = self.heap[0]
+                        timer = self.timers.get(key)
+                        if timer is None or timer[0] != due_at:
+                            heapq.heappop(self.heap)  # Отменён или перенесён
+                            continue
+                        now = time.time()
+                        if due_at <= now:
+                            heapq.heappop(self.heap)
+                            del self.timers[key]
+                            break
+                        self.condition.wait(due_at - now)
+                    else:
+                        self.condition.wait()
+                if self.stopped:
+                    return
+            self._fire(key, due_at, timer[1])
+
+    def _fire(self, key, due_at, payload):
+        chat_id, kind = key
+        outcome = "ok"
+        try:
+            result = self.handlers[kind](chat_id, payload)
+            if inspect.iscoroutine(result):
+                asyncio.run_coroutine_threadsafe(result, self.loop).result()
+        except Exception as e:
+            outcome = "error"
+            log_error("timer_failed", e, chat_id=chat_id, kind=kind)
+        with self.condition:
+            if outcome == "ok":
+                self.fired += 1
+            else:
+                self.failed += 1
+        metrics.inc("timers_fired_total", kind=kind, outcome=outcome)
+        try:
+            with metrics.timer("sqlite_seconds", op="timer_delete"), self.storage.lock, self.storage.conn:
+                # Если обработчик поставил таймер заново, строка уже с новым сроком
+                self.storage.conn.execute("DELETE FROM timers WHERE chat_id = ? AND kind = ? AND due_at = ?",
+                                          (chat_id, kind, due_at))
+        except Exception as e:
+            log_error("timer_write_failed", e, chat_id=chat_id, kind=kind)
@@ -0,0 +1,119 @@
+import threading
+import time
+from collections import deque
+from logs import log_event, log_error
+from metrics import metrics
+
+# Политики обработки обновлений, накопившихся, пока бот был выключен
+BACKLOG_PROCESS = "process"  # Обработать всё, кроме повторов
+BACKLOG_SKIP_STALE = "skip_stale"  # Отбросить сообщения старше max_age секунд
+BACKLOG_FAST_FORWARD = "fast_forward"  # Отбросить весь накопленный хвост при старте
+
+
+class UpdateTracker:
+    """Последний принятый update_id, отсев повторов и устаревших обновлений.
+
+    filter() пропускает через себя каждую пачку обновлений до обработчиков:
+    обновление с update_id, уже принятым до перезапуска или недавно (повтор
+    webhook), отбрасывается; при политике skip_stale отбрасываются и сообщения
+    старше max_age секунд — например «@» и «бинго» для игры, которой уже нет.
+    Наибольший принятый update_id пишется в bot_state через flush() — когда
+    flush_due() (не чаще раза в flush_interval секунд) и при остановке, а при
+    старте load() читает его, и опрос продолжается с него. Время от старта до первого живого
+    обновления пишется в лог.
+    В базе хранится одна строка bot_state с ключом last_update_id, в памяти —
+    update_id последних recent_size принятых обновлений для отсева повторов.
+    """
+
+    def __init__(self, storage, policy=BACKLOG_SKIP_STALE, max_age=120, recent_size=10000, flush_interval=1.0):
+        self.storage = storage
+        self.policy = policy
+        self.max_age = max_age
+        self.flush_interval = flush_interval
+        self.recent = set()
+        self.recent_order = deque()
+        self.recent_size = recent_size
+        self.lock = threading.Lock()
+        self.started = time.perf_counter()
+        self.first_live = False
+        self.skipped = {"duplicate": 0, "stale": 0}
+        self.restored_update_id = 0
+        self.last_update_id = 0
+        self.saved_update_id = 0
+        self.saved_at = time.monotonic()
+
+    def load(self):
+        """Читает сохранённый update_id (при старте бота); возвращает его."""
+        with metrics.timer("sqlite_seconds", op="update_offset_load"), self.storage.lock:
+            row = self.storage.conn.execute("SELECT value FROM bot_state WHERE key = 'last_update_id'").fetchone()
+        with self.lock:
+            self.restored_update_id = self.last_update_id = self.saved_update_id = row[0] if row else 0
+            self.started = time.perf_counter()
+        return self.restored_update_id
+
+    def filter(self, updates):
+        """Обновления пачки, которые нужно обработать; остальные отмечаются и отбрасываются."""
+        now = time.time()
+        accepted = []
+        with self.lock:
+            for update in updates:
+                update_id = update.update_id
+                if update_id <= self.restored_update_id or update_id in self.recent:
+                    self._skip("duplicate")
+                    continue
+                self._remember(update_id)
+                if self.policy == BACKLOG_SKIP_STALE and self._age(update, now) > self.max_age:
+                    self._skip("stale")
+                    continue
+                accepted.append(update)
+            if accepted and not self.first_live:
+                self.first_live = True
+                log_event("first_live_update", seconds=round(time.perf_counter() - self.started, 3),
+                          last_update_id=self.restored_update_id, **self.skipped)
+        return accepted
+
+    def flush_due(self):
+        """Пора ли сохранить update_id (прошло flush_interval секунд и он изменился)."""
+        with self.lock:
+            return (self.last_update_id != self.saved_update_id
+                    and time.monotonic() - self.saved_at >= self.flush_interval)
+
+    def flush(self):
+        """Сохраняет наибольший принятый update_id, если он изменился."""
+        with self.lock:
+            update_id = self.last_update_id
+            self.saved_at = time.monotonic()
+            if update_id == self.saved_update_id:
+                return
+        try:
+            with metrics.timer("sqlite_seconds", op="update_offset_write"), self.storage.lock, self.storage.conn:
+                self.storage.conn.execute(
+                    "INSERT INTO bot_state (key, value) VALUES ('last_update_id', ?) "
+                    "ON CONFLICT(key) DO UPDATE SET value = MAX(value, excluded.value)", (update_id,))
+        except Exception as e:
+            log_error("update_offset_write_failed", e, update_id=update_id)
+            return
+        with self.lock:
+            self.saved_update_id = max(self.saved_update_id, update_id)
+
+    def stats(self):
+        with self.lock:
+            return {"last_update_id": self.last_update_id, **self.skipped}
+
+    def _remember(self, update_id):
+        self.last_update_id = max(self.last_update_id, update_id)
+        self.recent.add(update_id)
+        self.recent_order.append(update_id)
+        if len(self.recent_order) > self.recent_size:
+            self.recent.discard(self.recent_order.popleft())
+
+    def _skip(self, reason):
+        self.skipped[reason] += 1
+        metrics.inc("updates_skipped_total", reason=reason)
+
+    def _age(self, update, now):
+        # У нажатий кнопок своей даты нет, их Telegram и так перестаёт принимать через несколько минут
+        message = update.message or update.edited_message
+        if message is None:
+            return 0
+        return now - message.date
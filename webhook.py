@@ -0,0 +1,187 @@
+import hmac
+import json
+import queue
+import secrets
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from telebot.types import Update
+from logs import log_event, log_error
+from metrics import metrics
+
+
+def chat_id_of(data):
+    """chat_id из JSON обновления Telegram (None, если чата нет или JSON не такой, как у Telegram)."""
+    for key in ("message", "edited_message", "channel_post", "edited_channel_post"):
+        if key in data:
+            return chat_id_in(data[key])
+    callback = data.get("callback_query")
+    if isinstance(callback, dict):
+        return chat_id_in(callback.get("message"))
+    return None
+
+
+def chat_id_in(message):
+    if not isinstance(message, dict) or not isinstance(message.get("chat"), dict):
+        return None
+    return message["chat"].get("id")
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class WebhookServer:
+    """Приём обновлений Telegram по webhook.
+
+    HTTP-обработчик только проверяет секрет, разбирает JSON и кладёт
+    обновление в ограниченную очередь, сразу отвечая 200. Очередь выбирается
+    по chat_id, поэтому обновления одного чата обрабатываются по порядку
+    одним воркером. Если очередь полна, Telegram получает 503 и повторит
+    доставку позже. Без секрета сервер не создаётся: порт открыт наружу, и
+    обновление без верного заголовка получает 403. Других адресов на этом
+    порту нет — глубина очередей и задержки обработки идут в метрики
+    webhook_* на локальный /metrics.
+    """
+
+    def __init__(self, bot, secret_token, host="0.0.0.0", port=8443, path="/webhook",
+                 workers=4, queue_size=1000):
+        if not secret_token:
+            raise ValueError("webhook без секрета принимает обновления от кого угодно")
+        self.bot = bot
+        self.path = path
+        self.secret_token = secret_token
+        self.queues = [queue.Queue(maxsize=queue_size) for _ in range(workers)]
+        self.latencies = deque(maxlen=10000)  # Секунды от приёма до конца обработки
+        self.received = 0
+        self.processed = 0
+        self.rejected = 0
+        self.failed = 0
+        self.stats_lock = threading.Lock()
+        self.threads = [threading.Thread(target=self._work, args=(q,), name=f"webhook-worker-{idx}", daemon=True)
+                        for idx, q in enumerate(self.queues)]
+        self.httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        metrics.register("webhook_received_total", lambda: self.stats()["received"], kind="counter")
+        metrics.register("webhook_rejected_total", lambda: self.stats()["rejected"], kind="counter")
+        metrics.register("webhook_failed_total", lambda: self.stats()["failed"], kind="counter")
+        metrics.register("webhook_queue_depth", lambda: sum(self.stats()["queue_depth"]))
+        metrics.register("webhook_latency_p99_ms", lambda: self.stats()["latency_p99_ms"])
+
+    def serve_forever(self):
+        # Обработчики выполняются прямо в воркере, без пула потоков telebot
+        self.bot.threaded = False
+        for thread in self.threads:
+            thread.start()
+        self.httpd.serve_forever()
+
+    def shutdown(self):
+        self.httpd.shutdown()
+        for q in self.queues:
+            q.join()
+
+    def enqueue(self, data):
+        """Ставит обновление в очередь его чата; False, если очередь полна."""
+        chat_id = chat_id_of(data)
+        q = self.queues[hash(chat_id) % len(self.queues)]
+        try:
+            q.put_nowait((time.perf_counter(), data))
+        except queue.Full:
+            with self.stats_lock:
+                self.rejected += 1
+            return False
+        with self.stats_lock:
+            self.received += 1
+        return True
+
+    def stats(self):
+        with self.stats_lock:
+            latencies = list(self.latencies)
+            return {
+                "received": self.received,
+                "processed": self.processed,
+                "rejected": self.rejected,
+                "failed": self.failed,
+                "queue_depth": [q.qsize() for q in self.queues],
+                "latency_p50_ms": round(percentile(latencies, 0.5) * 1000, 2),
+                "latency_p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+            }
+
+    def _work(self, q):
+        while True:
+            received_at, data = q.get()
+            try:
+                self.bot.process_new_updates([Update.de_json(data)])
+            except Exception as e:
+                with self.stats_lock:
+                    self.failed += 1
+                log_error("webhook_update_failed", e, update_id=data.get("update_id"))
+            finally:
+                with self.stats_lock:
+                    self.processed += 1
+                    self.latencies.append(time.perf_counter() - received_at)
+                q.task_done()
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                if self.path != server.path:
+                    self._reply(404)
+                    return
+                token = self.headers.get("X-Telegram-Bot-Api-Secret-Token", "")
+                if not hmac.compare_digest(token, server.secret_token):
+                    self._reply(403)
+                    return
+                try:
+                    length = int(self.headers.get("Content-Length", 0))
+                    data = json.loads(self.rfile.read(length))
+                except ValueError:
+                    self._reply(400)
+                    return
+                if not isinstance(data, dict):
+                    # Telegram всегда присылает объект; [1] или "x" — не обновление
+                    self._reply(400)
+                    return
+                self._reply(200 if server.enqueue(data) else 503)
+
+            def _reply(self, status, body=b""):
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # Не пишем строку на каждый запрос Telegram
+
+        return Handler
+
+
+def run_webhook(bot, url, host, port, secret_token, workers, queue_size, drop_pending=False):
+    """Регистрирует webhook в Telegram и запускает сервер до остановки.
+
+    drop_pending=True просит Telegram забыть обновления, накопленные до регистрации.
+    Без secret_token бот сам регистрирует webhook со случайным секретом; если
+    нет и url, проверить отправителя нечем, и сервер не запускается.
+    """
+    if not secret_token:
+        if not url:
+            raise ValueError("WEBHOOK_SECRET не задан, а webhook настроен вне бота")
+        # Новый секрет на каждый запуск: Telegram получает его в set_webhook ниже
+        secret_token = secrets.token_urlsafe(32)
+        log_event("webhook_secret_generated")
+    server = WebhookServer(bot, secret_token, host=host, port=port, workers=workers, queue_size=queue_size)
+    if url:
+        bot.remove_webhook()
+        bot.set_webhook(url=url.rstrip("/") + server.path, secret_token=secret_token,
+                        drop_pending_updates=drop_pending or None)
+    log_event("webhook_listening", host=host, port=port, path=server.path)
+    try:
+        server.serve_forever()
+    finally:
+        log_event("webhook_stats", **server.stats())